@@ -4,16 +4,19 @@ import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import { Pause, Play, RefreshCw, ScrollText } from "lucide-react";
 import clsx from "clsx";
 import Spinner from "./Spinner";
-import { fetchLogs, type LogsItem, type LogsResponse } from "@/app/lib/api";
+import {
+  fetchLogStats, fetchLogs, type LogStats, type LogsCursor, type LogsItem, type LogsResponse,
+} from "@/app/lib/api";
 
 type Props = { base: string; mock: boolean; pollMs?: number };
-type GroupKey = "target" | "init" | "collector" | "sfn";
+type GroupKey = "target" | "init" | "collector" | "sfn" | "all";
 
 const GROUPS: { key: GroupKey; label: string }[] = [
   { key: "target", label: "target_function" },
   { key: "init", label: "init_manager" },
   { key: "collector", label: "data_collector" },
   { key: "sfn", label: "step_functions" },
+  { key: "all", label: "all (merged by time)" },
 ];
 
 const PRESETS = [
@@ -80,12 +83,16 @@ export default function LiveLogs({ base, mock, pollMs = 3000 }: Props) {
   const [error, setError] = useState<string | null>(null);
   const [autoScroll, setAutoScroll] = useState(true);
   const [lastUpdated, setLastUpdated] = useState<string | null>(null);
+  // server-side totals (logs_proxy view=stats) over the whole window, not just loaded lines
+  const [stats, setStats] = useState<LogStats | null>(null);
 
   const listRef = useRef<HTMLDivElement>(null);
   const seen = useRef<Set<string>>(new Set());
+  const cursor = useRef<LogsCursor>(null);
 
   const clearAll = useCallback(() => {
     setItems([]); setNextToken(undefined); setLastUpdated(null); seen.current.clear();
+    cursor.current = null;
   }, []);
 
   const scrollToBottom = useCallback(() => {
@@ -97,7 +104,7 @@ export default function LiveLogs({ base, mock, pollMs = 3000 }: Props) {
   const merge = useCallback((resp: LogsResponse) => {
     const fresh: LogsItem[] = [];
     for (const it of resp.items) {
-      const key = `${it.ts}|${it.stream}|${it.message}`;
+      const key = it.id || `${it.ts}|${it.stream}|${it.message}`;
       if (!seen.current.has(key)) { seen.current.add(key); fresh.push(it); }
     }
     if (fresh.length) {
@@ -110,14 +117,18 @@ export default function LiveLogs({ base, mock, pollMs = 3000 }: Props) {
       setTimeout(scrollToBottom, 0);
     }
     setNextToken(resp.next);
+    if (resp.cursor) cursor.current = resp.cursor;
   }, [scrollToBottom]);
 
-  const load = useCallback(async ({ reset = false }: { reset?: boolean } = {}) => {
+  // reset: fresh window; tail: only lines after the cursor (cheap polling); else next page
+  const load = useCallback(async ({ reset = false, tail = false }: { reset?: boolean; tail?: boolean } = {}) => {
     setLoading(true); setError(null);
     try {
+      const useTail = tail && !nextToken && cursor.current !== null;
       const resp = await fetchLogs({
         base, mock, group, minutes, pattern, limit: 100,
-        next: reset ? undefined : nextToken,
+        next: reset || useTail ? undefined : nextToken,
+        cursor: useTail ? cursor.current : null,
       });
       merge(resp);
       setLastUpdated(prev => prev ?? new Date().toISOString());
@@ -130,10 +141,22 @@ export default function LiveLogs({ base, mock, pollMs = 3000 }: Props) {
 
   useEffect(() => {
     if (!live) return;
-    const id = setInterval(() => load(), pollMs);
+    const id = setInterval(() => load({ tail: true }), pollMs);
     return () => clearInterval(id);
   }, [live, load, pollMs]);
 
+  // stats are a separate, heavier scan: refresh them less often than the tail
+  useEffect(() => {
+    if (group !== "target") { setStats(null); return; }
+    let cancelled = false;
+    const loadStats = () => fetchLogStats({ base, mock, group: "target", minutes })
+      .then(r => { if (!cancelled) setStats(r?.totals ?? null); })
+      .catch(() => { if (!cancelled) setStats(null); });
+    loadStats();
+    const id = live ? setInterval(loadStats, Math.max(pollMs * 5, 15000)) : undefined;
+    return () => { cancelled = true; if (id) clearInterval(id); };
+  }, [base, mock, group, minutes, live, pollMs]);
+
   const onScroll = useCallback(() => {
     const el = listRef.current; if (!el) return;
     const nearBottom = el.scrollHeight - el.scrollTop - el.clientHeight < 40;
@@ -167,11 +190,20 @@ export default function LiveLogs({ base, mock, pollMs = 3000 }: Props) {
       {group === "target" && (
         <div className="flex items-center gap-2 text-[11px]">
           <span className="rounded-full border border-emerald-700/30 bg-emerald-600/10 px-2 py-0.5 font-medium text-emerald-300">
-            Warm {warmCold.warm}
+            Warm {stats?.warm ?? warmCold.warm}
           </span>
           <span className="rounded-full border border-slate-700 bg-slate-800 px-2 py-0.5 font-medium text-slate-300">
-            Cold {warmCold.cold}
+            Cold {stats?.cold ?? warmCold.cold}
           </span>
+          {stats && (
+            <span
+              className="rounded-full border border-slate-700 bg-slate-800 px-2 py-0.5 font-medium text-slate-300"
+              title={`Last ${minutes} min · ${stats.jit_prewarmed} served by pre-warmed envs`}
+            >
+              {stats.cold_rate != null ? `${(stats.cold_rate * 100).toFixed(1)}% cold` : "—"}
+              {stats.p95_ms != null ? ` · p95 ${stats.p95_ms.toFixed(0)} ms` : ""}
+            </span>
+          )}
         </div>
       )}
 
@@ -194,7 +226,7 @@ export default function LiveLogs({ base, mock, pollMs = 3000 }: Props) {
       </button>
 
       <button
-        onClick={() => load()}
+        onClick={() => load({ tail: true })}
         className={clsx(
           "inline-flex items-center gap-2 rounded-lg bg-slate-800 px-2.5 py-1.5 text-xs font-medium text-slate-200 ring-1 ring-slate-700 hover:bg-slate-700",
           loading && "opacity-60"
@@ -205,7 +237,7 @@ export default function LiveLogs({ base, mock, pollMs = 3000 }: Props) {
         Refresh
       </button>
     </div>
-  ), [live, loading, load, lastUpdated, warmCold, group]); // <-- include deps
+  ), [live, loading, load, lastUpdated, warmCold, stats, minutes, group]); // <-- include deps
 
   return (
     <div className="rounded-2xl border border-slate-800 bg-slate-900/60 p-4 shadow-sm">
@@ -263,7 +295,9 @@ export default function LiveLogs({ base, mock, pollMs = 3000 }: Props) {
             <div key={`${it.ts}-${idx}`} className="whitespace-pre-wrap font-mono text-xs leading-5">
               <span className="text-slate-500">{new Date(it.ts).toLocaleTimeString()} </span>
               <span className="text-slate-400">
-                {isSFN ? `[SFN${execTail ? `:${execTail}` : ""}]` : `[${it.stream.split("/").at(-1)}]`}
+                {isSFN
+                  ? `[SFN${execTail ? `:${execTail}` : ""}]`
+                  : `[${it.group ? `${it.group}:` : ""}${it.stream.split("/").at(-1)}]`}
               </span>{" "}
               {isSFN && label && (
                 <span className={`ml-1 inline-flex items-center rounded px-1.5 py-0.5 text-[10px] ring-1 ${sfnLabelClass()}`}>
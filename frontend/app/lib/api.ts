@@ -4,8 +4,27 @@ export type JitStatus = {
   trigger: boolean;
   threshold: number;
   mode?: string;
+  forecaster?: string;
+  reuse?: string; // why the stored forecast path was kept or re-forecast
+  quantile?: string; // which path is held against the threshold ("0.5" | "0.9")
+  accuracy?: ForecastAccuracy;
 } | null;
 
+// Rolling forecast scores from the collector (accuracy.py), shown on GET /jit-status.
+export type ForecastAccuracy = {
+  scored: number;
+  window: number;
+  pinball: Record<string, number>;
+  pinball_by_horizon: Record<string, number[]>;
+  hits: number;
+  misses: number;
+  false_alarms: number;
+  quiet: number;
+  hit_rate: number | null;
+  false_alarm_rate: number | null;
+  tuned: { quantile: string; threshold: number; cost: number; misses: number; false_alarms: number; samples: number } | null;
+};
+
 const MOCK: JitStatus = {
   forecast: [127.7, 126.24, 125.21, 123.52, 124.09, 122.64, 125.23, 127.55, 130.86, 162.68],
   forecast_p90: [181.22, 184.08, 180.88, 170.76, 177.44, 171.95, 178.86, 171.44, 180.65, 229.61],
@@ -46,17 +65,27 @@ function sleep(ms: number) {
   return new Promise((r) => setTimeout(r, ms));
 }
 
-export type LogsItem = { ts: string; message: string; stream: string };
-export type LogsResponse = { group: string; count: number; items: LogsItem[]; next?: string };
+export type LogsItem = { ts: string; message: string; stream: string; id?: string; group?: string };
+// Resume point for tail polling: newest timestamp seen + event ids at that timestamp
+// (multi-group requests return an opaque composite cursor string instead).
+export type LogsCursor = { since: number; after: string } | string | null;
+export type LogsResponse = {
+  group: string;
+  count: number;
+  items: LogsItem[];
+  next?: string;
+  cursor?: LogsCursor;
+};
 
 export async function fetchLogs(opts: {
   base: string;
   mock: boolean;
-  group: "target" | "init" | "collector" | "sfn";
+  group: "target" | "init" | "collector" | "sfn" | "all";
   minutes?: number;
   limit?: number;
   pattern?: string;
   next?: string;
+  cursor?: LogsCursor;
 }): Promise<LogsResponse> {
   if (opts.mock || !opts.base) {
     // return a harmless empty shape for dev/mock
@@ -74,6 +103,12 @@ export async function fetchLogs(opts: {
     params.set("pattern", opts.pattern.trim());
   }
   if (opts.next) params.set("next", opts.next);
+  else if (typeof opts.cursor === "string") params.set("cursor", opts.cursor);
+  else if (opts.cursor) {
+    // tail: only lines newer than what we already have
+    params.set("since", String(opts.cursor.since));
+    if (opts.cursor.after) params.set("after", opts.cursor.after);
+  }
 
   const res = await fetch(`${opts.base}/logs?${params.toString()}`, { cache: "no-store" });
   if (!res.ok) throw new Error(await res.text());
@@ -82,3 +117,49 @@ export async function fetchLogs(opts: {
 
 
 
+
+export type LogStats = {
+  invocations: number;
+  cold: number;
+  warm: number;
+  cold_rate: number | null;
+  jit_prewarmed: number;
+  prewarm_pings: number;
+  p50_ms: number | null;
+  p95_ms: number | null;
+  p99_ms: number | null;
+  cold_start_cost_ms: number | null;
+};
+export type LogStatsResponse = {
+  group: string;
+  view: "stats";
+  bucket_minutes: number;
+  pages: number;
+  scanned: number;
+  truncated: boolean;
+  totals: LogStats;
+  buckets: (LogStats & { ts: string })[];
+};
+
+// Aggregates computed server-side by logs_proxy (view=stats): a few hundred
+// bytes instead of every raw line.
+export async function fetchLogStats(opts: {
+  base: string;
+  mock: boolean;
+  group?: "target" | "orders";
+  minutes?: number;
+  bucket?: number;
+}): Promise<LogStatsResponse | null> {
+  if (opts.mock || !opts.base) return null;
+
+  const params = new URLSearchParams({
+    view: "stats",
+    group: opts.group ?? "target",
+    minutes: String(opts.minutes ?? 15),
+  });
+  if (opts.bucket) params.set("bucket", String(opts.bucket));
+
+  const res = await fetch(`${opts.base}/logs?${params.toString()}`, { cache: "no-store" });
+  if (!res.ok) throw new Error(await res.text());
+  return res.json();
+}
@@ -1,5 +1,5 @@
 "use client";
-import { useMemo, useState } from "react";
+import { Fragment, useMemo, useState } from "react";
 import { BarChart3, Flame, Gauge, LineChart, Power, RefreshCw, Rocket, ShieldCheck } from "lucide-react";
 import { fetchStatus, triggerInit, type JitStatus } from "../app/lib/api";
 import ForecastChart from "../app/components/ForecastChart";
@@ -8,6 +8,10 @@ import clsx from "clsx";
 import Spinner from "./components/Spinner";
 import LiveLogs from "./components/LiveLogs";
 
+function pct(x: number | null | undefined) {
+  return x == null ? "—" : `${Math.round(x * 100)}%`;
+}
+
 export default function JITDashboard() {
   const [status, setStatus] = useState<JitStatus | null>(null);
   const [loading, setLoading] = useState(false);
@@ -187,6 +191,34 @@ export default function JITDashboard() {
       </pre>
     </div>
 
+    {/* Forecast accuracy (scored by the collector once each horizon has happened) */}
+    <div className="rounded-2xl border border-slate-800 bg-slate-900/60 p-4 shadow-sm">
+      <div className="mb-2 text-sm font-medium text-slate-200">Forecast accuracy</div>
+      {status?.accuracy ? (
+        <dl className="grid grid-cols-2 gap-x-4 gap-y-1 text-xs">
+          <dt className="text-slate-400">Spike hit rate</dt>
+          <dd className="text-right text-slate-200">{pct(status.accuracy.hit_rate)}</dd>
+          <dt className="text-slate-400">False alarms</dt>
+          <dd className="text-right text-slate-200">{pct(status.accuracy.false_alarm_rate)}</dd>
+          {Object.entries(status.accuracy.pinball).map(([q, v]) => (
+            <Fragment key={q}>
+              <dt className="text-slate-400">Pinball loss p{Number(q) * 100}</dt>
+              <dd className="text-right text-slate-200">{v}</dd>
+            </Fragment>
+          ))}
+          <dt className="text-slate-400">Trigger rule</dt>
+          <dd className="text-right text-slate-200">
+            p{Number(status.quantile ?? "0.9") * 100} ≥ {status.threshold}
+            {status.accuracy.tuned ? " (tuned)" : ""}
+          </dd>
+          <dt className="text-slate-400">Forecasts scored</dt>
+          <dd className="text-right text-slate-200">{status.accuracy.scored}</dd>
+        </dl>
+      ) : (
+        <p className="text-xs text-slate-500">No scored forecasts yet.</p>
+      )}
+    </div>
+
     {/* Manual init */}
     <div className="rounded-2xl border border-slate-800 bg-slate-900/60 p-4 shadow-sm">
       <div className="mb-2 text-sm font-medium text-slate-200">Manual init call</div>
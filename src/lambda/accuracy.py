@@ -0,0 +1,165 @@
+import json
+
+# Forecast accuracy feedback. init_manager writes every fresh forecast as a
+# pending record (issue time = epoch of its first step); the collector scores
+# records whose whole horizon has been observed and folds them into one small
+# state object per target:
+#   - per-horizon pinball loss per quantile, as exponentially-weighted means
+#   - a ring of the last `window` forecasts' peaks vs the actual peak, which
+#     gives the spike hit/miss rate and lets tune() sweep threshold x quantile
+# init_manager reads the tuned {threshold, quantile} back on every cycle.
+
+
+def pinball(y, q, tau):
+    """Quantile (pinball) loss of prediction `q` at level `tau` for actual `y`."""
+    d = y - q
+    return tau * d if d >= 0 else (tau - 1.0) * d
+
+
+def forecast_record(issued, period, pred, engine, spike_level, threshold, quantile):
+    """
+    A pending forecast: its quantile paths, the operator's spike level (what
+    counts as a real spike) and the trigger rule in force when it was issued.
+    """
+    return {"issued": issued, "period": period, "engine": engine,
+            "pred": {q: [float(x) for x in path] for q, path in pred.items()},
+            "spike_level": spike_level, "threshold": threshold, "quantile": quantile}
+
+
+def score(record, actuals):
+    """Per-step pinball loss per quantile, and peaks, for a record with its actuals."""
+    loss = {q: [pinball(y, p, float(q)) for y, p in zip(actuals, path)]
+            for q, path in record["pred"].items()}
+    return {"loss": loss,
+            "peaks": {q: max(path) for q, path in record["pred"].items()},
+            "actual_peak": max(actuals) if len(actuals) else 0.0}
+
+
+class AccuracyState:
+    def __init__(self, alpha=0.1, window=288, loss=None, history=None, tuned=None, scored=0):
+        self.alpha = alpha
+        self.window = window
+        self.loss = loss or {}          # quantile -> [EW mean pinball per horizon step]
+        self.history = history or []    # [issued, {q: peak}, actual_peak, spike_level, fired]
+        self.tuned = tuned              # {"threshold", "quantile", ...} or None
+        self.scored = scored
+
+    def fold(self, record, scored):
+        """Add one scored forecast to the rolling aggregates."""
+        for q, steps in scored["loss"].items():
+            acc = self.loss.setdefault(q, [])
+            for h, v in enumerate(steps):
+                if h < len(acc):
+                    acc[h] += self.alpha * (v - acc[h])
+                else:
+                    acc.append(v)
+        fired = scored["peaks"].get(record["quantile"], 0.0) >= record["threshold"]
+        self.history.append([record["issued"], scored["peaks"], scored["actual_peak"],
+                             record["spike_level"], fired])
+        del self.history[:-self.window]
+        self.scored += 1
+
+    def outcomes(self):
+        """Confusion counts of the trigger decisions actually taken."""
+        out = {"hits": 0, "misses": 0, "false_alarms": 0, "quiet": 0}
+        for _, _, actual, level, fired in self.history:
+            spike = actual >= level
+            out["hits" if spike and fired else "misses" if spike else
+                "false_alarms" if fired else "quiet"] += 1
+        return out
+
+    def tune(self, miss_cost=5.0, waste_cost=1.0, min_samples=24, spread=0.5):
+        """
+        Pick the (quantile, threshold) that would have minimised
+        miss_cost x missed spikes + waste_cost x false alarms over the window.
+        Thresholds are the observed forecast peaks, kept within
+        [1 - spread, 1 + spread] x the spike level; ties go to the higher
+        threshold (fewer pings). Needs `min_samples` forecasts including at
+        least one real spike, else keeps the previous choice.
+        """
+        if len(self.history) < min_samples:
+            return self.tuned
+        level = self.history[-1][3]
+        if not any(actual >= lvl for _, _, actual, lvl, _ in self.history):
+            return self.tuned
+        lo, hi = level * (1.0 - spread), level * (1.0 + spread)
+        best = None
+        for q in sorted({q for _, peaks, _, _, _ in self.history for q in peaks}):
+            rows = [(peaks.get(q, 0.0), actual >= lvl)
+                    for _, peaks, actual, lvl, _ in self.history]
+            candidates = {min(hi, max(lo, p)) for p, _ in rows} | {level}
+            for t in candidates:
+                misses = sum(1 for p, spike in rows if spike and p < t)
+                false = sum(1 for p, spike in rows if not spike and p >= t)
+                cost = miss_cost * misses + waste_cost * false
+                if best is None or (cost, -t) < (best["cost"], -best["threshold"]):
+                    best = {"quantile": q, "threshold": round(t, 3), "cost": cost,
+                            "misses": misses, "false_alarms": false}
+        best["samples"] = len(self.history)
+        self.tuned = best
+        return best
+
+    def summary(self):
+        """What GET /jit-status shows."""
+        o = self.outcomes()
+        spikes = o["hits"] + o["misses"]
+        fired = o["hits"] + o["false_alarms"]
+        return {
+            "scored": self.scored,
+            "window": len(self.history),
+            "pinball": {q: round(sum(v) / len(v), 3) for q, v in self.loss.items() if v},
+            "pinball_by_horizon": {q: [round(x, 3) for x in v] for q, v in self.loss.items()},
+            **o,
+            "hit_rate": round(o["hits"] / spikes, 3) if spikes else None,
+            "false_alarm_rate": round(o["false_alarms"] / fired, 3) if fired else None,
+            "tuned": self.tuned,
+        }
+
+    def to_json(self):
+        return json.dumps({"alpha": self.alpha, "window": self.window, "loss": self.loss,
+                           "history": self.history, "tuned": self.tuned,
+                           "scored": self.scored}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw):
+        return cls(**json.loads(raw))
+
+
+def pending_prefix(root, target):
+    return f"{root.rstrip('/')}/{target}/pending/"
+
+
+def pending_key(root, target, record):
+    """<horizon end>-<issued>.json: the collector can tell from the key alone when it's due."""
+    steps = max((len(p) for p in record["pred"].values()), default=0)
+    due = record["issued"] + steps * record["period"]
+    return f"{pending_prefix(root, target)}{due}-{record['issued']}.json"
+
+
+def pending_due(key):
+    """Horizon end from a pending key; None if the name isn't one of ours."""
+    try:
+        return int(key.rsplit("/", 1)[1].split("-", 1)[0].split(".", 1)[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def state_key(root, target):
+    return f"{root.rstrip('/')}/{target}/state.json"
+
+
+def load_state(s3, bucket, key, alpha=None, window=None):
+    """
+    Stored state (or a new one). `alpha` / `window`, when given, replace the
+    stored ones, so a config change applies to both at once.
+    """
+    try:
+        state = AccuracyState.from_json(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+    except Exception:
+        state = AccuracyState()
+    if alpha is not None:
+        state.alpha = alpha
+    if window is not None:
+        state.window = window
+        del state.history[:-window]
+    return state
@@ -0,0 +1,69 @@
+import os
+import threading
+
+# Module-level caches: they live as long as the execution environment, so
+# warm invocations reuse clients (and their pooled keep-alive connections)
+# instead of paying client construction + TLS handshakes every time.
+_CLIENTS = {}
+_MEMO = {}
+# boto3 client creation on the shared default session isn't thread-safe, and
+# fleet/pre-warm workers can ask for the same first client concurrently
+_LOCK = threading.Lock()
+
+_DEFAULTS = {
+    "connect_timeout": float(os.environ.get("AWS_CONNECT_TIMEOUT_S", "2")),
+    "read_timeout": float(os.environ.get("AWS_READ_TIMEOUT_S", "10")),
+    "retries": {"mode": "adaptive",
+                "max_attempts": int(os.environ.get("AWS_MAX_ATTEMPTS", "3"))},
+    "tcp_keepalive": True,
+    "max_pool_connections": 10,
+}
+
+
+def client(service, **overrides):
+    """
+    Cached boto3 client for `service`. `overrides` are botocore Config fields
+    (e.g. read_timeout=5, max_pool_connections=20); each distinct set gets its
+    own cached client. boto3 itself is imported on first use.
+    """
+    key = (service, tuple(sorted((k, repr(v)) for k, v in overrides.items())))
+    c = _CLIENTS.get(key)
+    if c is None:
+        with _LOCK:
+            c = _CLIENTS.get(key)  # another thread may have built it while we waited
+            if c is None:
+                import boto3
+                from botocore.config import Config
+                c = boto3.client(service, config=Config(**{**_DEFAULTS, **overrides}))
+                _CLIENTS[key] = c
+    return c
+
+
+def memoize(name, fn):
+    """Compute a derived value once per environment (None is not cached)."""
+    if name not in _MEMO:
+        value = fn()
+        if value is None:
+            return None
+        _MEMO[name] = value
+    return _MEMO[name]
+
+
+def account_id():
+    """Caller's AWS account id (one STS call per environment)."""
+    def _lookup():
+        try:
+            return client("sts").get_caller_identity()["Account"]
+        except Exception:
+            return None
+    return memoize("account_id", _lookup)
+
+
+def state_machine_arn(name, region=None):
+    """arn:aws:states:<region>:<account>:stateMachine:<name>, or None if unresolvable."""
+    region = region or os.environ.get("AWS_REGION", "us-east-1")
+
+    def _build():
+        account = account_id()
+        return f"arn:aws:states:{region}:{account}:stateMachine:{name}" if account else None
+    return memoize(f"sfn_arn:{region}:{name}", _build)
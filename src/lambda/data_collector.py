@@ -1,8 +1,14 @@
 import os
 import json
-import boto3
 import logging
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from accuracy import load_state, pending_due, pending_prefix, score, state_key
+from aws_clients import client
+from series_prep import prepare_points
+from series_store import SeriesStore, series_prefix
+from tracing import Trace
 
 # Logging
 logging.basicConfig(
@@ -14,7 +20,13 @@ logger = logging.getLogger(__name__)
 BUCKET_NAME = os.environ.get("BUCKET_NAME", "sagemaker-us-east-1-061039798341")
 # the Lambda you're modeling
 FUNCTION_NAME = os.environ.get("FUNCTION_NAME", "target_function")
-KEY = os.environ.get("OUTPUT_KEY", "training/cloudwatch_metrics.json")
+# every Lambda to collect for (comma list); defaults to FUNCTION_NAME alone
+TARGET_FUNCTIONS = [x.strip() for x in (os.environ.get(
+    "TARGET_FUNCTIONS") or FUNCTION_NAME).split(",") if x.strip()]
+# hourly shards + manifest per (function, metric) live under this root (see series_store.py)
+SERIES_ROOT = os.environ.get("SERIES_ROOT", "series")
+# how many hourly shards to keep (default 30 days)
+RETENTION_HOURS = int(os.environ.get("RETENTION_HOURS", str(24 * 30)))
 # change back to train.json after testing
 TEST_KEY = os.environ.get(
     "TEST_KEY", "training/ecommerce_invocation_counts_demon.json")
@@ -22,6 +34,63 @@ TEST_KEY = os.environ.get(
 # 1-minute points, 24h lookback (override via env if needed)
 PERIOD_SECONDS = int(os.environ.get("PERIOD_SECONDS", "60"))
 LOOKBACK_HOURS = int(os.environ.get("LOOKBACK_HOURS", "24"))
+# re-fetch this much before the watermark so late/partial minutes get corrected
+LATE_MARGIN_MINUTES = int(os.environ.get("LATE_MARGIN_MINUTES", "5"))
+
+# series name -> how to query it (all use the FunctionName dimension)
+METRIC_SPECS = {
+    "Invocations": {"namespace": "AWS/Lambda", "metric": "Invocations",
+                    "stat": "Sum", "typecode": "i"},
+    "ConcurrentExecutions": {"namespace": "AWS/Lambda", "metric": "ConcurrentExecutions",
+                             "stat": "Maximum", "typecode": "i"},
+    "DurationP99": {"namespace": "AWS/Lambda", "metric": "Duration",
+                    "stat": "p99", "typecode": "f"},
+    "Throttles": {"namespace": "AWS/Lambda", "metric": "Throttles",
+                  "stat": "Sum", "typecode": "i"},
+    # cold-start anatomy EMF from target_function (0 in minutes without a cold start);
+    # opt-in per function via FUNCTION_METRICS, since other functions never emit it
+    "InitDurationMs": {"namespace": "ColdStartDemo", "metric": "InitDurationMs",
+                       "stat": "Average", "typecode": "f"},
+    "FirstInvokeOverheadMs": {"namespace": "ColdStartDemo", "metric": "FirstInvokeOverheadMs",
+                              "stat": "Average", "typecode": "f"},
+    "ColdStartCostMs": {"namespace": "ColdStartDemo", "metric": "ColdStartCostMs",
+                        "stat": "Average", "typecode": "f"},
+}
+_EMF_METRICS = [m for m, spec in METRIC_SPECS.items() if spec["namespace"] == "ColdStartDemo"]
+# collected for every TARGET_FUNCTION (AWS/Lambda metrics exist for all of them)
+METRICS = [x.strip() for x in os.environ.get(
+    "METRICS", ",".join(m for m in METRIC_SPECS if m not in _EMF_METRICS)).split(",")
+    if x.strip() in METRIC_SPECS]
+# extra metrics per function: "fn=InitDurationMs+ColdStartCostMs,other=..."
+# (default: the anatomy EMF for FUNCTION_NAME, the one function known to emit it)
+FUNCTION_METRICS = {}
+for _item in os.environ.get(
+        "FUNCTION_METRICS", f"{FUNCTION_NAME}={'+'.join(_EMF_METRICS)}").split(","):
+    _fn, _, _names = _item.partition("=")
+    if _fn.strip():
+        FUNCTION_METRICS[_fn.strip()] = [
+            m.strip() for m in _names.split("+") if m.strip() in METRIC_SPECS]
+# optional legacy JSON export of the first function's Invocations (off when empty)
+EXPORT_JSON_KEY = os.environ.get("EXPORT_JSON_KEY", "")
+EXPORT_POINTS = int(os.environ.get("EXPORT_POINTS", "1440"))
+# get_metric_data accepts at most 500 queries per call
+MAX_QUERIES_PER_CALL = min(500, int(os.environ.get("MAX_QUERIES_PER_CALL", "500")))
+# concurrent per-series S3 work (manifest read, shard read/write, manifest write)
+COLLECT_PARALLELISM = int(os.environ.get("COLLECT_PARALLELISM", "16"))
+
+# forecast accuracy feedback (accuracy.py): init_manager's pending forecasts are
+# scored here once their horizon has been collected, then the trigger re-tuned
+ACCURACY = os.environ.get("ACCURACY", "1") != "0"
+ACCURACY_ROOT = os.environ.get("ACCURACY_ROOT", "accuracy")
+ACCURACY_WINDOW = int(os.environ.get("ACCURACY_WINDOW", "288"))  # forecasts in the ring
+ACCURACY_ALPHA = float(os.environ.get("ACCURACY_ALPHA", "0.1"))  # EW weight of new losses
+# pending forecasts older than this are dropped unscored (e.g. collector was down)
+ACCURACY_MAX_AGE_HOURS = int(os.environ.get("ACCURACY_MAX_AGE_HOURS", "24"))
+# trade-off for tune(): a missed spike (cold starts) vs a needless pre-warm
+TUNE_MISS_COST = float(os.environ.get("TUNE_MISS_COST", "5"))
+TUNE_WASTE_COST = float(os.environ.get("TUNE_WASTE_COST", "1"))
+TUNE_MIN_SAMPLES = int(os.environ.get("TUNE_MIN_SAMPLES", "24"))
+TUNE_SPREAD = float(os.environ.get("TUNE_SPREAD", "0.5"))
 
 
 def _iso_no_tz(dt: datetime) -> str:
@@ -29,128 +98,248 @@ def _iso_no_tz(dt: datetime) -> str:
     return dt.replace(tzinfo=None).isoformat(sep=" ", timespec="seconds")
 
 
+def _store(s3, function_name, metric):
+    return SeriesStore(s3, BUCKET_NAME, series_prefix(function_name, metric, SERIES_ROOT),
+                       retention_shards=RETENTION_HOURS,
+                       typecode=METRIC_SPECS[metric]["typecode"],
+                       period=PERIOD_SECONDS)
+
+
+def _query(query_id, function_name, spec):
+    return {
+        "Id": query_id,
+        "MetricStat": {
+            "Metric": {
+                "Namespace": spec["namespace"],
+                "MetricName": spec["metric"],
+                "Dimensions": [{
+                    "Name": "FunctionName",
+                    "Value": function_name
+                }]
+            },
+            "Period": PERIOD_SECONDS,
+            "Stat": spec["stat"]
+        },
+        "ReturnData": True
+    }
+
+
 def lambda_handler(event, context):
-    cloudwatch = boto3.client("cloudwatch")
-    s3 = boto3.client("s3")
+    cloudwatch = client("cloudwatch")
+    s3 = client("s3")
+    trace = Trace("data_collector")  # per-stage EMF timings; TRACE_EMF=0 disables
 
     # --- 1) Test override (if present) ---
     try:
-        test_obj = s3.get_object(Bucket=BUCKET_NAME, Key=TEST_KEY)
-        test_data = json.loads(test_obj["Body"].read())
-        logger.info(
-            "Using test data from s3://%s/%s (%d points)",
-            BUCKET_NAME, TEST_KEY, len(test_data)
-        )
-        updated_data = _clean_and_sort(test_data)
-        _write_series(s3, updated_data)
-        return {"status": "updated (test)", "data_points": len(updated_data)}
+        with trace.span("TestProbe"):
+            test_obj = s3.get_object(Bucket=BUCKET_NAME, Key=TEST_KEY)
+        store = _store(s3, TARGET_FUNCTIONS[0], "Invocations")
+        # the file is static between uploads: only re-shard it when its ETag changes
+        etag = test_obj.get("ETag")
+        if etag and store.manifest().get("source_etag") == etag:
+            logger.info("Test data s3://%s/%s unchanged (ETag %s)", BUCKET_NAME, TEST_KEY, etag)
+            status, points = "unchanged (test)", 0
+        else:
+            test_data = json.loads(test_obj["Body"].read())
+            logger.info(
+                "Using test data from s3://%s/%s (%d points)",
+                BUCKET_NAME, TEST_KEY, len(test_data)
+            )
+            updated = prepare_points(test_data, period=PERIOD_SECONDS, agg="last")
+            store.manifest()["source_etag"] = etag  # persisted by append's manifest write
+            store.append(zip(range(updated.start, updated.end, updated.period), updated.values))
+            status, points = "updated (test)", len(updated)
+        if ACCURACY:
+            with trace.span("Accuracy"):
+                trace.add("ForecastsScored", _score_forecasts(s3, TARGET_FUNCTIONS[0], store))
+        trace.emit()
+        return {"status": status, "data_points": points}
     except Exception as e:
         logger.info(
             "No test data at s3://%s/%s → CloudWatch. (%s)",
             BUCKET_NAME, TEST_KEY, e
         )
 
-    # --- 2) Fetch existing series (if any) ---
-    existing = []
-    try:
-        obj = s3.get_object(Bucket=BUCKET_NAME, Key=KEY)
-        existing = json.loads(obj["Body"].read())
-        logger.info("Loaded existing series: %d points", len(existing))
-    except Exception:
-        logger.info("No existing series yet; starting fresh.")
+    # --- 2) One store per (function, metric); one query id per store ---
+    series = {}
+    for fn in TARGET_FUNCTIONS:
+        for metric in dict.fromkeys(METRICS + FUNCTION_METRICS.get(fn, [])):
+            series[f"m{len(series)}"] = (fn, metric, _store(s3, fn, metric))
 
-    # --- 3) Pull 1-min Invocations for the target function ---
+    # --- 3) Batched pull: incremental series from their oldest mark, new ones backfill ---
     end = datetime.utcnow()
-    start = end - timedelta(hours=LOOKBACK_HOURS)
-
-    resp = cloudwatch.get_metric_data(
-        MetricDataQueries=[{
-            "Id": "invocations",
-            "MetricStat": {
-                "Metric": {
-                    "Namespace": "AWS/Lambda",
-                    "MetricName": "Invocations",
-                    "Dimensions": [{
-                        "Name": "FunctionName",
-                        "Value": FUNCTION_NAME
-                    }]
-                },
-                "Period": PERIOD_SECONDS,
-                "Stat": "Sum"
-            }
-        }],
-        StartTime=start,
-        EndTime=end,
-        ScanBy="TimestampAscending"
-    )
+    workers = max(1, min(COLLECT_PARALLELISM, len(series)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        with trace.span("ManifestRead"):
+            marks = dict(zip(series, pool.map(
+                lambda st: st.fetched_through(), [st for _, _, st in series.values()])))
+        # one window per group, so a series without data can't widen everyone's
+        groups = {}
+        for qid, mark in marks.items():
+            groups.setdefault("incremental" if mark else "backfill", []).append(qid)
+        results = {}
+        start = end
+        for kind, ids in groups.items():
+            group_start = (min(_fetch_start(marks[q], end) for q in ids)
+                           if kind == "incremental" else _fetch_start(None, end))
+            start = min(start, group_start)
+            for i in range(0, len(ids), MAX_QUERIES_PER_CALL):
+                batch = ids[i:i + MAX_QUERIES_PER_CALL]
+                queries = [_query(qid, series[qid][0], METRIC_SPECS[series[qid][1]])
+                           for qid in batch]
+                with trace.span("MetricFetch"):
+                    results.update(_get_metric_data(cloudwatch, queries,
+                                                    start=group_start, end=end))
+
+        # --- 4) Demultiplex and append each series into its open shard(s) ---
+        checked = int(end.replace(tzinfo=timezone.utc).timestamp())
+
+        def write(qid):
+            fn, metric, st = series[qid]
+            r = results.get(qid, {})
+            cast = int if METRIC_SPECS[metric]["typecode"] == "i" else float
+            n = st.append(
+                (int(ts.timestamp()), cast(v))
+                for ts, v in zip(r.get("Timestamps", []), r.get("Values", []))
+                if v is not None
+            )
+            if not n:
+                st.mark_checked(checked)  # nothing new: move its fetch start forward anyway
+            return n
+
+        with trace.span("SeriesWrite"):
+            appended = sum(pool.map(write, list(series)))
+    for _, _, st in series.values():
+        trace.add("S3BytesRead", st.bytes_read, "Bytes")
+        trace.add("S3BytesWritten", st.bytes_written, "Bytes")
+
+    if ACCURACY and "Invocations" in METRICS:
+        with trace.span("Accuracy"):
+            for fn, metric, st in series.values():
+                if metric == "Invocations":
+                    trace.add("ForecastsScored", _score_forecasts(s3, fn, st))
+
+    if EXPORT_JSON_KEY:
+        with trace.span("Export"):
+            _export_json(s3, _store(s3, TARGET_FUNCTIONS[0], "Invocations"))
 
-    results = resp.get("MetricDataResults", [])
-    values = results[0].get("Values", []) if results else []
-    timestamps = results[0].get("Timestamps", []) if results else []
-
-    # Pair, sort, and normalize
-    pairs = sorted(zip(timestamps, values), key=lambda p: p[0])
-    cw_points = [
-        {"start": _iso_no_tz(ts), "target": [int(v)]}
-        for ts, v in pairs
-        if v is not None
-    ]
     logger.info(
-        "Fetched %d CloudWatch points (period=%ss)",
-        len(cw_points),
+        "Fetched %d CloudWatch points for %d series since %s (period=%ss)",
+        appended,
+        len(series),
+        _iso_no_tz(start),
         PERIOD_SECONDS
     )
+    trace.add("SeriesCount", len(series))
+    trace.add("DataPoints", appended)
+    trace.emit()
+    return {"status": "updated", "series": len(series), "data_points": appended}
 
-    # --- 4) Merge (existing + new), sort, de-dupe by timestamp ---
-    merged = _merge_series(existing, cw_points)
-    _write_series(s3, merged)
-    return {"status": "updated", "data_points": len(merged)}
-
-
-def _merge_series(existing, new_points):
-    """Append, sort by 'start', and drop duplicates (keep latest)."""
-    if not isinstance(existing, list):
-        existing = []
-    if not isinstance(new_points, list):
-        new_points = []
-
-    # build map of start -> record (new overwrites old)
-    by_ts = {}
-    for d in existing:
-        if isinstance(d, dict) and "start" in d and "target" in d:
-            by_ts[str(d["start"])] = d
-    for d in new_points:
-        if isinstance(d, dict) and "start" in d and "target" in d:
-            by_ts[str(d["start"])] = d
-
-    cleaned = [by_ts[k] for k in sorted(by_ts.keys())]
-    logger.info("Merged series size: %d", len(cleaned))
-    return cleaned
-
-
-def _clean_and_sort(points):
-    """Ensure proper schema + sorted ascending by 'start'."""
-    def _ok(d):
-        return (
-            isinstance(d, dict) and
-            "start" in d and
-            "target" in d and
-            isinstance(d["target"], list) and
-            len(d["target"]) > 0
-        )
 
-    safe = []
-    for d in points:
-        if _ok(d):
-            try:
-                v = int(d["target"][0])
-                safe.append({"start": str(d["start"]), "target": [v]})
-            except Exception:
+def _export_json(s3, store):
+    """Write the newest EXPORT_POINTS of a series in the legacy JSON list shape."""
+    points = store.tail(EXPORT_POINTS).to_points()
+    s3.put_object(Bucket=BUCKET_NAME, Key=EXPORT_JSON_KEY, Body=json.dumps(points))
+    logger.info("Exported %d points to s3://%s/%s", len(points), BUCKET_NAME, EXPORT_JSON_KEY)
+
+
+def _list_keys(s3, prefix):
+    keys, kwargs = [], {"Bucket": BUCKET_NAME, "Prefix": prefix}
+    while True:
+        resp = s3.list_objects_v2(**kwargs)
+        keys.extend(o["Key"] for o in resp.get("Contents", []))
+        if not resp.get("IsTruncated"):
+            return keys
+        kwargs["ContinuationToken"] = resp["NextContinuationToken"]
+
+
+def _score_forecasts(s3, function_name, store):
+    """
+    Score `function_name`'s pending forecasts whose horizon is now fully
+    collected, fold them into its accuracy state and re-tune its trigger.
+    Returns how many were scored.
+    """
+    shards = store.manifest()["shards"]
+    keys = _list_keys(s3, pending_prefix(ACCURACY_ROOT, function_name))
+    if not shards or not keys:
+        return 0
+    end = shards[-1]["end"]
+    oldest = end - ACCURACY_MAX_AGE_HOURS * 3600
+    records, done = [], []
+    for key in keys:
+        due = pending_due(key)  # horizon end is in the key: only matured records are read
+        if due is None or due < oldest:
+            done.append(key)  # not ours, or too old to have actuals any more
+            continue
+        if due > end:
+            continue
+        rec = json.loads(s3.get_object(Bucket=BUCKET_NAME, Key=key)["Body"].read())
+        steps = max(len(p) for p in rec["pred"].values())
+        if rec["issued"] + steps * rec["period"] <= end:  # (older <issued>.json names)
+            records.append((key, rec, steps))
+    scored = 0
+    if records:
+        actual = store.tail((end - min(r["issued"] for _, r, _ in records)) // store.period)
+        state = load_state(s3, BUCKET_NAME, state_key(ACCURACY_ROOT, function_name),
+                           alpha=ACCURACY_ALPHA, window=ACCURACY_WINDOW)
+        for key, rec, steps in sorted(records, key=lambda r: r[1]["issued"]):
+            i = (rec["issued"] - actual.start) // actual.period
+            if i < 0:  # before the oldest shard we still have
+                done.append(key)
                 continue
-    safe.sort(key=lambda d: str(d["start"]))
-    return safe
+            state.fold(rec, score(rec, [float(v) for v in actual.values[i:i + steps]]))
+            done.append(key)
+            scored += 1
+        state.tune(TUNE_MISS_COST, TUNE_WASTE_COST, TUNE_MIN_SAMPLES, TUNE_SPREAD)
+        s3.put_object(Bucket=BUCKET_NAME, Key=state_key(ACCURACY_ROOT, function_name),
+                      Body=state.to_json())
+        logger.info("Scored %d forecast(s) of %s; tuned=%s",
+                    scored, function_name, state.tuned)
+    for key in done:
+        s3.delete_object(Bucket=BUCKET_NAME, Key=key)
+    return scored
+
+
+def _fetch_start(watermark, end):
+    """
+    Start of the fetch window: watermark (or last empty check) minus late
+    margin, else full lookback.
+    """
+    backfill = end - timedelta(hours=LOOKBACK_HOURS)
+    if not watermark:
+        logger.info("No watermark yet; backfilling %dh", LOOKBACK_HOURS)
+        return backfill
+    try:
+        start = datetime.fromisoformat(str(watermark)).replace(tzinfo=None)
+    except ValueError:
+        logger.info("Unreadable watermark %r; backfilling", watermark)
+        return backfill
+    return max(backfill, start - timedelta(minutes=LATE_MARGIN_MINUTES))
 
 
-def _write_series(s3_client, series):
-    s3_client.put_object(Bucket=BUCKET_NAME, Key=KEY, Body=json.dumps(series))
-    logger.info("Wrote %d points to s3://%s/%s", len(series), BUCKET_NAME, KEY)
+def _get_metric_data(cloudwatch, queries, start, end):
+    """
+    Run get_metric_data, following NextToken until exhausted.
+    Returns {query_id: {"Timestamps": [...], "Values": [...]}}.
+    """
+    out = {}
+    kwargs = {
+        "MetricDataQueries": queries,
+        "StartTime": start,
+        "EndTime": end,
+        "ScanBy": "TimestampAscending",
+    }
+    pages = 0
+    while True:
+        resp = cloudwatch.get_metric_data(**kwargs)
+        pages += 1
+        for r in resp.get("MetricDataResults", []):
+            acc = out.setdefault(r["Id"], {"Timestamps": [], "Values": []})
+            acc["Timestamps"].extend(r.get("Timestamps", []))
+            acc["Values"].extend(r.get("Values", []))
+        token = resp.get("NextToken")
+        if not token:
+            break
+        kwargs["NextToken"] = token
+    logger.info("get_metric_data: %d page(s) for %d queries", pages, len(queries))
+    return out
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Module-level so it survives warm invocations of the same environment.
+_MEMORY = OrderedDict()
+
+
+def series_hash(start, values):
+    """Cheap content hash of a forecast input (start + target values)."""
+    h = hashlib.sha1(str(start).encode())
+    h.update(json.dumps(values, separators=(",", ":")).encode())
+    return h.hexdigest()
+
+
+def cache_key(target, data_hash, quantiles, model_version):
+    raw = json.dumps([target, data_hash, sorted(quantiles), model_version])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def horizon_key(target, quantiles, model_version):
+    """One stored forecast path per (target, quantiles, model) - not per input."""
+    return cache_key(target, "horizon", quantiles, model_version)
+
+
+def horizon_entry(issued, period, pred, engine, model_version):
+    """What gets persisted: the full quantile path and the time of its first step."""
+    return {"issued": issued, "period": period, "pred": pred,
+            "engine": engine, "version": model_version}
+
+
+def reuse_horizon(entry, end, actuals, model_version, min_remaining=3):
+    """
+    Decide whether a stored forecast path still stands, given the series now
+    ends at `end` (epoch, exclusive) with `actuals` its most recent values.
+
+    Returns (pred, reason): `pred` is the not-yet-elapsed part of the stored
+    path (None = forecast again) and `reason` says why. A path is dropped when
+    the model version changed, fewer than `min_remaining` steps are left, or
+    any elapsed minute left the band [q50 - (q90 - q50), q90].
+    """
+    if not entry:
+        return None, "none stored"
+    if entry.get("version") != model_version:
+        return None, "model version changed"
+    pred, period = entry["pred"], entry["period"]
+    q50, q90 = pred["0.5"], pred["0.9"]
+    step = (end - entry["issued"]) // period  # minutes of the horizon already observed
+    if step < 0:
+        return None, "series went backwards"
+    if len(q90) - step < min_remaining:
+        return None, f"horizon used ({step}/{len(q90)} steps)"
+    observed = list(actuals[len(actuals) - step:]) if step else []
+    if len(observed) < step:
+        return None, "missing actuals"
+    for i, y in enumerate(observed):
+        lo = q50[i] - (q90[i] - q50[i])
+        if y > q90[i] or y < lo:
+            return None, f"drift at step {i} ({y:g} outside [{lo:g}, {q90[i]:g}])"
+    return {q: path[step:] for q, path in pred.items()}, f"reused ({step}/{len(q90)} steps)"
+
+
+class ForecastCache:
+    """
+    Three-tier forecast cache: process memory -> /tmp -> optional S3.
+
+    Every tier stores {"expires": epoch, "value": ...}; expired entries are
+    misses. Memory and /tmp are size-bounded (LRU / oldest-mtime eviction).
+    A hit in a slower tier is copied into the faster ones.
+    """
+
+    def __init__(self, ttl_seconds=600, max_entries=128, tmp_dir="/tmp/forecast-cache",
+                 max_files=256, s3_client=None, bucket=None, s3_prefix=None):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.tmp_dir = tmp_dir
+        self.max_files = max_files
+        self.s3 = s3_client if (bucket and s3_prefix) else None
+        self.bucket = bucket
+        self.s3_prefix = (s3_prefix or "").rstrip("/")
+
+    # ---- public ---------------------------------------------------------------
+    def get(self, key):
+        """Return (value, tier) or (None, None)."""
+        now = time.time()
+
+        entry = _MEMORY.get(key)
+        if entry and entry["expires"] > now:
+            _MEMORY.move_to_end(key)
+            return entry["value"], "memory"
+        _MEMORY.pop(key, None)
+
+        entry = self._tmp_get(key)
+        if entry and entry["expires"] > now:
+            self._mem_put(key, entry)
+            return entry["value"], "tmp"
+
+        entry = self._s3_get(key)
+        if entry and entry["expires"] > now:
+            self._mem_put(key, entry)
+            self._tmp_put(key, entry)
+            return entry["value"], "s3"
+        return None, None
+
+    def put(self, key, value, ttl=None):
+        entry = {"expires": time.time() + (self.ttl if ttl is None else ttl), "value": value}
+        self._mem_put(key, entry)
+        self._tmp_put(key, entry)
+        self._s3_put(key, entry)
+
+    # ---- memory ---------------------------------------------------------------
+    def _mem_put(self, key, entry):
+        _MEMORY[key] = entry
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > self.max_entries:
+            _MEMORY.popitem(last=False)
+
+    # ---- /tmp -----------------------------------------------------------------
+    def _tmp_path(self, key):
+        return os.path.join(self.tmp_dir, f"{key}.json")
+
+    def _tmp_get(self, key):
+        try:
+            with open(self._tmp_path(key)) as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _tmp_put(self, key, entry):
+        try:
+            os.makedirs(self.tmp_dir, exist_ok=True)
+            with open(self._tmp_path(key), "w") as f:
+                json.dump(entry, f)
+            files = [os.path.join(self.tmp_dir, n) for n in os.listdir(self.tmp_dir)]
+            if len(files) > self.max_files:
+                files.sort(key=os.path.getmtime)
+                for path in files[:len(files) - self.max_files]:
+                    os.remove(path)
+        except Exception as e:
+            logger.info("forecast cache: /tmp write skipped (%s)", e)
+
+    # ---- S3 (shared across environments) ---------------------------------------
+    def _s3_get(self, key):
+        if not self.s3:
+            return None
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=f"{self.s3_prefix}/{key}.json")
+            return json.loads(obj["Body"].read())
+        except Exception:
+            return None
+
+    def _s3_put(self, key, entry):
+        if not self.s3:
+            return
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=f"{self.s3_prefix}/{key}.json",
+                               Body=json.dumps(entry))
+        except Exception as e:
+            logger.info("forecast cache: S3 write skipped (%s)", e)
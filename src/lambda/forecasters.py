@@ -0,0 +1,211 @@
+import json
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# Every engine returns, per instance, {"0.5": [...], "0.9": [...]}: the same
+# quantile contract as DeepAR's "quantiles" output, so callers don't care
+# which engine produced it.
+
+
+def _quantile(sorted_vals, q):
+    """Linear-interpolated quantile of an already sorted list."""
+    if not sorted_vals:
+        return 0.0
+    pos = (len(sorted_vals) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+
+def _bands(point_path, residuals, quantiles, widen=True):
+    """Point path + empirical residual quantiles -> {q: path}, clipped at 0."""
+    res = sorted(residuals) or [0.0]
+    out = {}
+    for q in quantiles:
+        r = _quantile(res, float(q))
+        out[q] = [max(0.0, p + r * (math.sqrt(h + 1) if widen else 1.0))
+                  for h, p in enumerate(point_path)]
+    return out
+
+
+class Forecaster:
+    """Base class: forecast(instances, prediction_length, quantiles) -> [{q: [..]}]."""
+
+    name = "base"
+
+    def forecast(self, instances, prediction_length, quantiles):
+        return [self.predict([float(x) for x in inst["target"]], prediction_length, quantiles)
+                for inst in instances]
+
+    def predict(self, y, prediction_length, quantiles):
+        raise NotImplementedError
+
+
+class SageMakerForecaster(Forecaster):
+    """The DeepAR real-time endpoint (one invoke_endpoint for all instances)."""
+
+    name = "sagemaker"
+
+    def __init__(self, runtime_client, endpoint_name, num_samples=200):
+        self.rt = runtime_client
+        self.endpoint_name = endpoint_name
+        self.num_samples = num_samples
+
+    def forecast(self, instances, prediction_length, quantiles):
+        payload = {
+            "instances": instances,
+            "configuration": {
+                "num_samples": self.num_samples,
+                "output_types": ["quantiles"],
+                "quantiles": list(quantiles)
+            }
+        }
+        resp = self.rt.invoke_endpoint(
+            EndpointName=self.endpoint_name,
+            ContentType="application/json",
+            Body=json.dumps(payload)
+        )
+        return [p["quantiles"] for p in json.loads(resp["Body"].read())["predictions"]]
+
+
+class SeasonalNaiveForecaster(Forecaster):
+    """y[t+h] = y[t+h-season]; bands from the seasonal-difference residuals."""
+
+    name = "seasonal"
+
+    def __init__(self, season=60):
+        self.season = season
+
+    def predict(self, y, prediction_length, quantiles):
+        s = self.season if len(y) > self.season else 1
+        if not y:
+            return {q: [0.0] * prediction_length for q in quantiles}
+        path = [y[len(y) - s + (h % s)] for h in range(prediction_length)]
+        residuals = [y[i] - y[i - s] for i in range(s, len(y))]
+        return _bands(path, residuals, quantiles, widen=False)
+
+
+class EwmaForecaster(Forecaster):
+    """
+    Holt's linear (double exponential) smoothing; alpha only (beta=0) is plain
+    EWMA. Bands come from empirical one-step-ahead residual quantiles, widened
+    by sqrt(h).
+    """
+
+    name = "ewma"
+
+    def __init__(self, alpha=0.3, beta=0.05):
+        self.alpha = alpha
+        self.beta = beta
+
+    def predict(self, y, prediction_length, quantiles):
+        if not y:
+            return {q: [0.0] * prediction_length for q in quantiles}
+        a, b = self.alpha, self.beta
+        level, trend = y[0], 0.0
+        residuals = []
+        for v in y[1:]:
+            residuals.append(v - (level + trend))
+            prev = level
+            level = a * v + (1 - a) * (level + trend)
+            trend = b * (level - prev) + (1 - b) * trend
+        path = [level + trend * (h + 1) for h in range(prediction_length)]
+        return _bands(path, residuals, quantiles)
+
+
+class LagQuantileForecaster(Forecaster):
+    """
+    Linear quantile model on the last `lags` points: least-squares AR fit, then
+    each quantile's intercept is shifted to the empirical residual quantile
+    (location-shift quantile regression). Multi-step paths are recursive on
+    the median.
+    """
+
+    name = "lagqr"
+
+    def __init__(self, lags=5):
+        self.lags = lags
+
+    def predict(self, y, prediction_length, quantiles):
+        p = min(self.lags, max(0, len(y) - 2))
+        if p == 0:
+            return EwmaForecaster().predict(y, prediction_length, quantiles)
+
+        rows = [[1.0] + y[t - p:t][::-1] for t in range(p, len(y))]
+        coef = _lstsq(rows, y[p:])
+        residuals = [yt - sum(c * x for c, x in zip(coef, row))
+                     for row, yt in zip(rows, y[p:])]
+
+        hist = list(y[-p:])
+        path = []
+        for _ in range(prediction_length):
+            nxt = sum(c * x for c, x in zip(coef, [1.0] + hist[::-1]))
+            path.append(nxt)
+            hist = hist[1:] + [nxt]
+        return _bands(path, residuals, quantiles)
+
+
+def _lstsq(rows, ys, ridge=1e-6):
+    """Solve the normal equations (X'X + ridge*I) b = X'y by Gaussian elimination."""
+    k = len(rows[0])
+    a = [[sum(r[i] * r[j] for r in rows) + (ridge if i == j else 0.0) for j in range(k)]
+         + [sum(r[i] * yv for r, yv in zip(rows, ys))] for i in range(k)]
+    for c in range(k):
+        piv = max(range(c, k), key=lambda r: abs(a[r][c]))
+        a[c], a[piv] = a[piv], a[c]
+        if abs(a[c][c]) < 1e-12:
+            continue
+        for r in range(k):
+            if r != c:
+                f = a[r][c] / a[c][c]
+                a[r] = [x - f * z for x, z in zip(a[r], a[c])]
+    return [a[i][k] / a[i][i] if abs(a[i][i]) >= 1e-12 else 0.0 for i in range(k)]
+
+
+LOCAL_ENGINES = {
+    SeasonalNaiveForecaster.name: SeasonalNaiveForecaster,
+    EwmaForecaster.name: EwmaForecaster,
+    LagQuantileForecaster.name: LagQuantileForecaster,
+}
+
+
+def engine_for(target, spec, default="sagemaker"):
+    """
+    Pick the engine name for a target from a 'target=engine,...' spec
+    (e.g. FORECASTERS="target_function=ewma,demo-orders-api=sagemaker").
+    """
+    for item in (spec or "").split(","):
+        name, _, engine = item.partition("=")
+        if name.strip() == target and engine.strip():
+            return engine.strip().lower()
+    return default
+
+
+def make_forecaster(name, runtime_client=None, endpoint_name=None, fallback="ewma"):
+    """
+    Engine by name. An unknown name (a config typo) logs and gives the
+    `fallback` engine instead, so one bad FORECASTER(S) entry doesn't take
+    the target down; only an unknown fallback raises.
+    """
+    if name == SageMakerForecaster.name:
+        return SageMakerForecaster(runtime_client, endpoint_name)
+    if name not in LOCAL_ENGINES:
+        if fallback and fallback != name:
+            logger.warning("unknown forecaster '%s'; using %s", name, fallback)
+            return make_forecaster(fallback, runtime_client, endpoint_name, fallback=None)
+        raise ValueError(f"unknown forecaster '{name}'")
+    return LOCAL_ENGINES[name]()
+
+
+def forecast_with_fallback(primary, fallback, instances, prediction_length, quantiles):
+    """Run `primary`; on any error/timeout run `fallback`. Returns (preds, engine name)."""
+    try:
+        return primary.forecast(instances, prediction_length, quantiles), primary.name
+    except Exception as e:
+        if fallback is None or fallback.name == primary.name:
+            raise
+        logger.warning("forecaster %s failed (%s); falling back to %s",
+                       primary.name, e, fallback.name)
+        return fallback.forecast(instances, prediction_length, quantiles), fallback.name
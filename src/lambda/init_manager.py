@@ -1,8 +1,19 @@
 import os
 import json
+import time
 import base64
-import boto3
-import dateutil.parser
+from concurrent.futures import ThreadPoolExecutor
+
+from accuracy import forecast_record, load_state, pending_key, state_key
+from aws_clients import client, state_machine_arn
+from forecast_cache import (ForecastCache, cache_key, horizon_entry, horizon_key,
+                            reuse_horizon, series_hash)
+from forecasters import engine_for, forecast_with_fallback, make_forecaster
+from prewarm import environments_needed, fan_out, plan_prewarms
+from series_prep import prepare_points
+from series_store import SeriesStore, iso_from_epoch, series_prefix
+from tracing import Trace
+from warm_pool import load_pool, refresh_from_logs, save_pool
 
 
 def _is_apigw(event):
@@ -20,18 +31,13 @@ def _get_sfn_arn():
     """
     Resolve the Step Functions state machine ARN at runtime.
     - Prefer env SFN_ARN if provided.
-    - Otherwise build from AWS_REGION + Account ID + SFN_NAME (default: ecommerce_jit_workflow).
+    - Otherwise build from AWS_REGION + Account ID + SFN_NAME (default: ecommerce_jit_workflow),
+      memoized per environment so STS is called once, not per request.
     """
     arn = os.environ.get("SFN_ARN")
     if arn:
         return arn
-    name = os.environ.get("SFN_NAME", "ecommerce_jit_workflow")
-    region = os.environ.get("AWS_REGION", "us-east-1")
-    try:
-        account = boto3.client("sts").get_caller_identity()["Account"]
-    except Exception:
-        return None
-    return f"arn:aws:states:{region}:{account}:stateMachine:{name}"
+    return state_machine_arn(os.environ.get("SFN_NAME", "ecommerce_jit_workflow"))
 
 
 def _get_target(event):
@@ -61,6 +67,381 @@ def _get_target(event):
     return target
 
 
+def _spec_value(spec, target, default):
+    """Value for `target` in a 'target=value,...' spec (same shape as FORECASTERS)."""
+    for item in (spec or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() == target and value.strip():
+            return value.strip()
+    return default
+
+
+def _forecast_cache(s3, bucket):
+    return ForecastCache(
+        ttl_seconds=int(os.environ.get("FORECAST_CACHE_TTL", "600")),
+        max_entries=int(os.environ.get("FORECAST_CACHE_SIZE", "128")),
+        tmp_dir=os.environ.get("FORECAST_CACHE_DIR", "/tmp/forecast-cache"),
+        s3_client=s3, bucket=bucket,
+        s3_prefix=os.environ.get("FORECAST_CACHE_PREFIX"))  # unset = no shared tier
+
+
+def _model_version(engine, endpoint_name):
+    return os.environ.get("MODEL_VERSION", endpoint_name) if engine == "sagemaker" else engine
+
+
+def _forecast_key(target, start, values, quantiles, engine, endpoint_name):
+    return cache_key(target, series_hash(start, values), quantiles,
+                     _model_version(engine, endpoint_name))
+
+
+# ---- Horizon reuse: keep a 12-step path until the actuals drift out of it ----
+def _reuse_enabled():
+    return os.environ.get("FORECAST_REUSE", "1") != "0"
+
+
+def _reused_forecast(cache, target, quantiles, engine, endpoint_name, series):
+    """(remaining path, engine, reason) from the stored path, or (None, None, reason)."""
+    version = _model_version(engine, endpoint_name)
+    entry, _ = cache.get(horizon_key(target, quantiles, version))
+    pred, reason = reuse_horizon(entry, series.end, series.values, version,
+                                 int(os.environ.get("REUSE_MIN_REMAINING", "3")))
+    return pred, (entry or {}).get("engine") if pred else None, reason
+
+
+def _store_horizon(cache, target, quantiles, engine, endpoint_name, series, pred, used):
+    version = _model_version(engine, endpoint_name)
+    cache.put(horizon_key(target, quantiles, version),
+              horizon_entry(series.end, series.period, pred, used, version),
+              ttl=len(pred["0.9"]) * series.period)
+
+
+def _sizing():
+    """(expected duration ms, cap, headroom) used to turn a p90 peak into environments."""
+    return (float(os.environ.get("EXPECTED_DURATION_MS", "1000")),
+            int(os.environ.get("MAX_PREWARM", "50")),
+            float(os.environ.get("PREWARM_HEADROOM", "1.0")))
+
+
+def _pool_key(target):
+    return f'{os.environ.get("WARM_POOL_PREFIX", "warm-pools").rstrip("/")}/{target}.json'
+
+
+def _live_pool(s3, bucket, target, idle_s):
+    """Registry of `target`'s environments, brought up to date from its log group."""
+    pool = load_pool(s3, bucket, _pool_key(target))
+    group = f'{os.environ.get("LOG_GROUP_PREFIX", "/aws/lambda/")}{target}'
+    try:
+        refresh_from_logs(pool, client("logs"), group, idle_s)
+    except Exception as e:  # no logs yet / no access: fall back to what the registry knows
+        print(f"[warn] warm pool refresh for {target} failed: {e}")
+        pool.expire(time.time(), idle_s)
+    return pool
+
+
+def _prewarm(s3, lam, bucket, target, peak, parallel, wanted=None):
+    """
+    Warm enough environments of `target` for a p90 peak of `peak` invocations/min
+    (or exactly `wanted`), minus the environments the warm pool says are still live.
+    """
+    client_context = base64.b64encode(json.dumps(
+        {"custom": {"COLD_START": "false"}}
+    ).encode()).decode()
+    duration_ms, cap, headroom = _sizing()
+    if wanted is None:
+        # p90 peak (invocations/min) x expected duration -> concurrent envs to warm
+        wanted = environments_needed(peak, duration_ms, cap=cap, headroom=headroom)
+    wanted = min(wanted, cap)  # every ping is in flight at once (see `parallel`)
+    tracked = os.environ.get("WARM_POOL", "1") != "0"
+    idle_s = float(os.environ.get("IDLE_EXPIRY_S", "600"))
+    live, pool = 0, None
+    if tracked:
+        pool = _live_pool(s3, bucket, target, idle_s)
+        live = pool.live(time.time(), idle_s)
+    # only the shortfall is pinged; live envs idle right now may absorb some of
+    # these pings (refreshing them) instead of new ones booting, which is fine
+    shortfall = max(0, wanted - live)
+    # zero-work ping; the hold keeps each env busy so the next ping needs a new one
+    warm = fan_out(
+        lam, target, shortfall, client_context,
+        payload={"prewarm": {"hold_ms": int(os.environ.get("PREWARM_HOLD_MS", "250"))}},
+        max_workers=max(parallel, shortfall),
+        jitter_ms=int(os.environ.get("PREWARM_JITTER_MS", "50")))
+    if warm["failed"]:
+        print(f"[warn] {warm['failed']}/{shortfall} pre-warms of {target} failed: "
+              f"{warm['errors']}")
+    env_ids = warm["env_ids"]
+    live_after = warm["confirmed"]
+    if pool is not None:
+        now = time.time()
+        for env_id in env_ids:
+            pool.observe(env_id, now)
+        save_pool(s3, bucket, _pool_key(target), pool)
+        live_after = pool.live(now, idle_s)
+    return {"wanted": wanted,
+            "live": live,
+            "live_after": live_after,
+            "requested": warm["requested"],
+            "confirmed": warm["confirmed"],
+            "environments": len(env_ids),
+            "failed": warm["failed"]}
+
+
+# ---- Time-phased pre-warm plan ---------------------------------------------------
+def _plan_enabled():
+    return os.environ.get("PREWARM_PLAN", "1") != "0"
+
+
+def _plan_key(target):
+    return f'{os.environ.get("PREWARM_PLAN_PREFIX", "prewarm-plans").rstrip("/")}/{target}.json'
+
+
+def _plan_cycle(s3, lam, bucket, target, q90, start, period, threshold, execute, parallel,
+                trigger=None):
+    """
+    Rebuild `target`'s pre-warm schedule from the current p90 path (taking
+    into account what earlier cycles already warmed), and if `execute`,
+    fire the entries due before the next cycle (PLAN_CYCLE_S) as one
+    fan-out. The plan and warm state are persisted to S3 either way.
+    `trigger` is the path held against the threshold if not the p90 one.
+    Returns (plan, environments due now, warm result or None).
+    """
+    now = time.time()
+    duration_ms, cap, headroom = _sizing()
+    lead_s = float(os.environ.get("COLD_START_MS", "1000")) / 1000.0
+    idle_s = float(os.environ.get("IDLE_EXPIRY_S", "600"))
+    try:
+        state = json.loads(s3.get_object(Bucket=bucket, Key=_plan_key(target))["Body"].read())
+    except Exception:
+        state = {}
+    warm_until = state.get("warm_until", 0)
+    warm_count = state.get("warm_count", 0) if warm_until > now else 0
+
+    def build():
+        return plan_prewarms(start, period, q90, threshold, duration_ms, cap, headroom,
+                             lead_s=lead_s, idle_expiry_s=idle_s,
+                             warm_count=warm_count, warm_until=warm_until, trigger=trigger)
+
+    entries = build()
+    cycle_s = float(os.environ.get("PLAN_CYCLE_S", "60"))
+    due = max((e["envs"] for e in entries if e["at"] < now + cycle_s), default=0)
+    warm = None
+    if execute and due:
+        warm = _prewarm(s3, lam, bucket, target, None, parallel, wanted=due)
+        # what is actually warm now (live pool, or distinct envs that answered),
+        # so a shortfall is topped up by the next due entry rather than assumed covered
+        warm_count, warm_until = warm["live_after"], now + idle_s
+        entries = build()  # what's left once these are warm
+    plan = {"target": target, "updated": now, "warm_count": warm_count,
+            "warm_until": warm_until, "entries": entries}
+    s3.put_object(Bucket=bucket, Key=_plan_key(target), Body=json.dumps(plan))
+    return plan, due, warm
+
+
+# ---- Forecast accuracy feedback (scored by data_collector) -------------------------
+def _accuracy_enabled():
+    return os.environ.get("ACCURACY", "1") != "0"
+
+
+def _accuracy_root():
+    return os.environ.get("ACCURACY_ROOT", "accuracy")
+
+
+def _trigger_rule(s3, bucket, target, spike_level):
+    """
+    (threshold, quantile, accuracy state) for `target`: the collector's tuned
+    rule when AUTO_TUNE is on and one exists, else `spike_level` on the p90.
+    """
+    state = load_state(s3, bucket, state_key(_accuracy_root(), target))
+    tuned = state.tuned if os.environ.get("AUTO_TUNE", "1") != "0" else None
+    if tuned:
+        return float(tuned["threshold"]), tuned["quantile"], state
+    return spike_level, "0.9", state
+
+
+def _record_forecast(s3, bucket, target, series, pred, used, spike_level, threshold, quantile):
+    """Leave a fresh forecast for the collector to score once its horizon is observed."""
+    rec = forecast_record(series.end, series.period, pred, used, spike_level, threshold,
+                          quantile)
+    s3.put_object(Bucket=bucket, Key=pending_key(_accuracy_root(), target, rec),
+                  Body=json.dumps(rec))
+
+
+# ---- Fleet mode ---------------------------------------------------------------
+def _fleet_targets():
+    return [x.strip() for x in (os.environ.get("FLEET_TARGETS") or "").split(",") if x.strip()]
+
+
+def _batches(items, max_count, max_bytes):
+    """Split (target, instance, ...) items into endpoint-request-sized batches."""
+    batch, size = [], 0
+    for item in items:
+        n = len(json.dumps(item[1], separators=(",", ":"))) + 1
+        if batch and (len(batch) >= max_count or size + n > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(item)
+        size += n
+    if batch:
+        yield batch
+
+
+def _fleet_forecasts(targets, s3, rt, bucket, endpoint_name, window, trace):
+    """
+    Forecast every target in one cycle. Series reads run concurrently, cache
+    hits and still-valid stored paths (horizon reuse) are answered locally,
+    and the rest go to their engine as batched
+    `instances` requests (at most FLEET_BATCH_SIZE series / FLEET_MAX_PAYLOAD_BYTES
+    each) sent concurrently. Returns {target: (quantiles, engine used)}.
+    """
+    parallel = int(os.environ.get("FLEET_PARALLELISM", "8"))
+    root = os.environ.get("SERIES_ROOT", "series")
+    quantiles = ["0.5", "0.9"]
+    prediction_length = int(os.environ.get("PREDICTION_LENGTH", "12"))
+    default_engine = os.environ.get("FORECASTER", "sagemaker").lower()
+    fallback_engine = os.environ.get("FALLBACK_FORECASTER", "ewma").lower()
+    cache = _forecast_cache(s3, bucket)
+
+    def load(target):
+        store = SeriesStore(s3, bucket, series_prefix(target, "Invocations", root))
+        return target, store.tail(window), store.bytes_read
+
+    def run(job):
+        engine, batch = job
+        try:
+            preds, used = forecast_with_fallback(
+                make_forecaster(engine, rt, endpoint_name, fallback=fallback_engine or "ewma"),
+                make_forecaster(fallback_engine, rt, endpoint_name) if fallback_engine else None,
+                [item[1] for item in batch], prediction_length, quantiles)
+        except Exception as e:  # one bad batch shouldn't stop the rest of the fleet
+            print(f"[warn] forecast batch of {len(batch)} failed: {e}")
+            return engine, batch, [], None
+        return engine, batch, preds, used
+
+    out, pending = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(targets)))) as pool:
+        with trace.span("SeriesRead"):
+            loaded = list(pool.map(load, targets))
+        for target, series, nbytes in loaded:
+            trace.add("SeriesBytes", nbytes, "Bytes")
+            trace.add("SeriesLength", len(series))
+            if not len(series):
+                print(f"[warn] no series data for {target}; skipped")
+                continue
+            engine = engine_for(target, os.environ.get("FORECASTERS"), default=default_engine)
+            inst = {"start": series.start_iso, "target": series.values.tolist()}
+            key = _forecast_key(target, inst["start"], inst["target"], quantiles,
+                                engine, endpoint_name)
+            with trace.span("CacheGet"):
+                pred, _ = cache.get(key)
+            used = engine
+            if pred is None and _reuse_enabled():
+                with trace.span("HorizonCheck"):
+                    pred, used, _ = _reused_forecast(
+                        cache, target, quantiles, engine, endpoint_name, series)
+                trace.add("ForecastReused", 1 if pred is not None else 0)
+            if pred is not None:
+                out[target] = (pred, used, series, False)
+            else:
+                pending.setdefault(engine, []).append((target, inst, key, series))
+
+        jobs = [(engine, batch) for engine, items in pending.items()
+                for batch in _batches(
+                    items, int(os.environ.get("FLEET_BATCH_SIZE", "50")),
+                    int(os.environ.get("FLEET_MAX_PAYLOAD_BYTES", "5000000")))]
+        with trace.span("Forecast"):
+            results = list(pool.map(run, jobs))
+    trace.add("ForecastRequests", len(jobs))
+
+    for engine, batch, preds, used in results:
+        for (target, _, key, series), pred in zip(batch, preds):
+            out[target] = (pred, used, series, True)
+            if used == engine:  # don't pin a fallback answer
+                cache.put(key, pred)
+                if _reuse_enabled():
+                    _store_horizon(cache, target, quantiles, engine, endpoint_name,
+                                   series, pred, used)
+    return out
+
+
+def _run_fleet(targets, action, mode, s3, lam, rt, bucket, endpoint_name, window,
+               prewarm_parallel, trace):
+    """
+    One control-plane cycle for every FLEET_TARGETS function: batched
+    forecasts, a trigger decision per target (THRESHOLDS="fn=300,..." over
+    THRESHOLD), and on "init" a pre-warm of each triggered target. The
+    top-level `trigger` (any target) keeps the Step Functions Choice working.
+    """
+    forecasts = _fleet_forecasts(targets, s3, rt, bucket, endpoint_name, window, trace)
+    default_threshold = float(os.environ.get("THRESHOLD", 300))
+    planned = _plan_enabled()
+    parallel = int(os.environ.get("FLEET_PARALLELISM", "8"))
+    levels = {t: float(_spec_value(os.environ.get("THRESHOLDS"), t, default_threshold))
+              for t in forecasts}
+    rules = {}
+    if _accuracy_enabled() and forecasts:
+        def rule(target):
+            pred, used, series, fresh = forecasts[target]
+            threshold, quantile, _ = _trigger_rule(s3, bucket, target, levels[target])
+            if fresh:
+                _record_forecast(s3, bucket, target, series, pred, used, levels[target],
+                                 threshold, quantile)
+            return target, (threshold, quantile)
+
+        with trace.span("Accuracy"):
+            with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(forecasts)))) as pool:
+                rules = dict(pool.map(rule, list(forecasts)))
+    decisions, plan_jobs = {}, []
+    for target in targets:
+        if target not in forecasts:
+            decisions[target] = {"trigger": False, "error": "no forecast"}
+            continue
+        pred, used, series, _ = forecasts[target]
+        q90 = [float(x) for x in pred["0.9"]]
+        threshold, quantile = rules.get(target, (levels[target], "0.9"))
+        path = [float(x) for x in pred[quantile]]
+        decisions[target] = {
+            "forecast": [float(x) for x in pred["0.5"]],
+            "forecast_p90": q90,
+            "trigger": max(path) >= threshold,
+            "threshold": threshold,
+            "quantile": quantile,
+            "forecaster": used,
+        }
+        if planned:
+            plan_jobs.append((target, q90, series.end, series.period, threshold, path))
+
+    warmed = {}
+    if plan_jobs:
+        # each target's plan is its own S3 object (+ fan-out on init); run them side by side
+        def cycle(job):
+            target, q90, start, period, threshold, path = job
+            return target, _plan_cycle(s3, lam, bucket, target, q90, start, period, threshold,
+                                       action == "init", prewarm_parallel, trigger=path)
+
+        with trace.span("PrewarmPlan"):
+            with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(plan_jobs)))) as pool:
+                cycles = list(pool.map(cycle, plan_jobs))
+        for target, (plan, due, warm) in cycles:
+            decisions[target]["trigger"] = due > 0
+            decisions[target]["plan"] = plan["entries"]
+            if warm:
+                warmed[target] = warm
+    triggered = [t for t in targets if decisions[t]["trigger"]]
+
+    if action != "init":
+        return {"fleet": True, "mode": mode, "trigger": bool(triggered),
+                "triggered": triggered, "targets": decisions}
+
+    if not planned:
+        with trace.span("PrewarmInvoke"):
+            for target in triggered:
+                warmed[target] = _prewarm(s3, lam, bucket, target,
+                                          max(decisions[target]["forecast_p90"]),
+                                          prewarm_parallel)
+    trace.add("PrewarmRequested", sum(w["requested"] for w in warmed.values()))
+    return {"status": "initialized", "fleet": True, "mode": mode, "targets": warmed}
+
+
 def lambda_handler(event, context):
     # ---- Inputs / mode -------------------------------------------------------
     action = (event.get("Input", {}) or {}).get("action", "check")
@@ -93,23 +474,39 @@ def lambda_handler(event, context):
         }
 
     # ---- Env / clients -------------------------------------------------------
+    trace = Trace("init_manager")  # per-stage EMF timings; TRACE_EMF=0 disables
     endpoint_name = os.environ["ENDPOINT_NAME"]
     bucket = os.environ["BUCKET_NAME"]
     threshold = float(os.environ.get("THRESHOLD", 300))
     # target_function = os.environ.get("TARGET_FUNCTION", "target_function")
     # <- add this env in Terraform to the rule name
     schedule_rule = os.environ.get("SCHEDULE_RULE")
+    # DeepAR only looks at context_length (120 in sagemaker_train.py) recent points;
+    # send k x that, so request size stays O(context) however long the history is.
+    window = (int(os.environ.get("CONTEXT_LENGTH", "120"))
+              * int(os.environ.get("CONTEXT_MULTIPLIER", "2")))
+
+    # pre-warm fan-out: all pings of one target overlap (up to MAX_PREWARM of them),
+    # so size the pool and the connection pool for that
+    prewarm_parallel = max(int(os.environ.get("PREWARM_PARALLELISM", "20")),
+                           int(os.environ.get("MAX_PREWARM", "50")))
 
-    s3 = boto3.client("s3")
-    lam = boto3.client("lambda")
-    rt = boto3.client("sagemaker-runtime")
-    events = boto3.client("events")  # <- NEW
+    # cached per environment (aws_clients.py): warm runs reuse connections
+    s3 = client("s3")
+    lam = client("lambda",
+                 max_pool_connections=prewarm_parallel,
+                 read_timeout=float(os.environ.get("PREWARM_TIMEOUT_S", "15")))
+    # bounded so a slow/broken endpoint falls back to the local engine in time
+    rt = client("sagemaker-runtime",
+                read_timeout=float(os.environ.get("ENDPOINT_TIMEOUT_S", "5")),
+                retries={"mode": "standard", "max_attempts": 1})
 
     # ---- DEMO-GATE: If API Gateway POST called us, enable schedule + trigger SFN FIRST ----------
     if _is_apigw(event) and event.get("httpMethod") == "POST":
         # 1) Enable the disabled EventBridge rule so autoschedule takes over after the demo click
         if schedule_rule:
             try:
+                events = client("events")
                 state = (events.describe_rule(
                     Name=schedule_rule) or {}).get("State")
                 if state != "ENABLED":
@@ -124,7 +521,7 @@ def lambda_handler(event, context):
         sfn_arn = _get_sfn_arn()
         if sfn_arn:
             try:
-                sfn = boto3.client("stepfunctions")
+                sfn = client("stepfunctions")
                 sfn.start_execution(
                     stateMachineArn=sfn_arn,
                     input=json.dumps({"Input": {"action": "check"}})
@@ -135,43 +532,100 @@ def lambda_handler(event, context):
         else:
             print("[warn] No SFN ARN could be resolved; skipping SFN start")
 
+    # ---- Fleet mode: all FLEET_TARGETS in one batched cycle (scheduled runs) ----
+    fleet = _fleet_targets()
+    if fleet and mode == "auto" and not _is_apigw(event):
+        body = _run_fleet(fleet, action, mode, s3, lam, rt, bucket, endpoint_name, window,
+                          prewarm_parallel, trace)
+        trace.emit()
+        return body
+
     # ---- Data source selection -----------------------------------------------
-    key = "training/cloudwatch_metrics.json"
+    key = None
     if mode == "spike":
         key = "training/demo_spike.json"
     elif mode == "calm":
         key = "training/demo_calm.json"
 
     # ---- Load & shape series --------------------------------------------------
-    obj = s3.get_object(Bucket=bucket, Key=key)
-    points = json.loads(obj["Body"].read())
-    points.sort(key=lambda d: dateutil.parser.parse(d["start"]))
-
-    series_start = points[0]["start"]
-    series_target = [int(d["target"][0]) for d in points if d.get("target")]
-
-    # ---- Forecast (p50 & p90) -------------------------------------------------
-    payload = {
-        "instances": [{
-            "start": series_start,
-            "target": series_target
-        }],
-        "configuration": {
-            "num_samples": 200,
-            "output_types": ["quantiles"],
-            "quantiles": ["0.5", "0.9"]
-        }
-    }
-    resp = rt.invoke_endpoint(
-        EndpointName=endpoint_name,
-        ContentType="application/json",
-        Body=json.dumps(payload)
-    )
-    pred = json.loads(resp["Body"].read())["predictions"][0]["quantiles"]
+    if key:
+        # demo JSON: same cleaning as everywhere else (series_prep.py), then the tail
+        with trace.span("SeriesRead"):
+            raw = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+            full = prepare_points(json.loads(raw), agg="last")
+        trace.add("SeriesBytes", len(raw), "Bytes")
+        values = full.values[-window:]
+        series_start = iso_from_epoch(full.end - len(values) * full.period)
+        series_target = values.tolist()
+    else:
+        # collector's sharded binary store: read only the newest shards we need
+        store = SeriesStore(s3, bucket, series_prefix(
+            os.environ.get("TARGET_FUNCTION", "target_function"), "Invocations",
+            os.environ.get("SERIES_ROOT", "series")))
+        with trace.span("SeriesRead"):
+            series = store.tail(window)
+        trace.add("SeriesBytes", store.bytes_read, "Bytes")
+        series_start = series.start_iso
+        series_target = series.values.tolist()
+    if not series_target:
+        raise RuntimeError(f"no series data for mode '{mode}'")
+    trace.add("SeriesLength", len(series_target))
+
+    # ---- Forecast (p50 & p90), memoized on the exact input -------------------
+    # Engine per target: FORECASTERS="fn=ewma,..." > FORECASTER > sagemaker.
+    # Local engines: seasonal | ewma | lagqr (forecasters.py, no endpoint call).
+    forecast_target = os.environ.get("TARGET_FUNCTION", "target_function")
+    quantiles = ["0.5", "0.9"]
+    engine = engine_for(forecast_target, os.environ.get("FORECASTERS"),
+                        default=os.environ.get("FORECASTER", "sagemaker").lower())
+    fallback_engine = os.environ.get("FALLBACK_FORECASTER", "ewma").lower()
+    cache = _forecast_cache(s3, bucket)
+    ckey = _forecast_key(forecast_target, series_start, series_target, quantiles,
+                         engine, endpoint_name)
+    with trace.span("CacheGet"):
+        pred, tier = cache.get(ckey)
+    used, reuse, fresh = engine, None, False
+    if pred is not None:
+        print(f"[cache] forecast hit ({tier})")
+    elif not key and _reuse_enabled():
+        # new minute(s) since the last forecast: keep its path unless actuals drifted
+        with trace.span("HorizonCheck"):
+            pred, used, reuse = _reused_forecast(
+                cache, forecast_target, quantiles, engine, endpoint_name, series)
+        print(f"[reuse] {reuse}")
+        trace.add("ForecastReused", 1 if pred is not None else 0)
+    if pred is None:
+        instances = [{"start": series_start, "target": series_target}]
+        if trace.enabled:
+            trace.add("ForecastPayloadBytes", len(json.dumps(instances)), "Bytes")
+        with trace.span("Forecast"):
+            preds, used = forecast_with_fallback(
+                make_forecaster(engine, rt, endpoint_name, fallback=fallback_engine or "ewma"),
+                make_forecaster(fallback_engine, rt, endpoint_name) if fallback_engine else None,
+                instances, int(os.environ.get("PREDICTION_LENGTH", "12")), quantiles)
+        pred, fresh = preds[0], True
+        if used == engine:  # don't pin a fallback answer; retry the primary next time
+            with trace.span("CachePut"):
+                cache.put(ckey, pred)
+                if not key and _reuse_enabled():
+                    _store_horizon(cache, forecast_target, quantiles, engine, endpoint_name,
+                                   series, pred, used)
     q50 = [float(x) for x in pred["0.5"]]
     q90 = [float(x) for x in pred["0.9"]]
 
-    will_spike = max(q90) >= threshold
+    # tuned trigger rule + accuracy feedback (collector-scored) for collected series
+    quantile, accuracy = "0.9", None
+    if not key and _accuracy_enabled():
+        with trace.span("Accuracy"):
+            spike_level = threshold
+            threshold, quantile, state = _trigger_rule(s3, bucket, forecast_target, threshold)
+            if fresh:
+                _record_forecast(s3, bucket, forecast_target, series, pred, used, spike_level,
+                                 threshold, quantile)
+        accuracy = state.summary()
+    trigger_path = [float(x) for x in pred[quantile]]
+
+    will_spike = max(trigger_path) >= threshold
     if mode == "spike":  # force for demo
         will_spike = True
     if mode == "calm":
@@ -182,26 +636,44 @@ def lambda_handler(event, context):
         "forecast_p90": q90,
         "trigger": will_spike,
         "threshold": threshold,
-        "mode": mode
+        "mode": mode,
+        "forecaster": used
     }
+    if reuse:
+        result["reuse"] = reuse
+    if accuracy is not None:
+        result["quantile"] = quantile
+        result["accuracy"] = accuracy
+
+    # ---- Time-phased plan (scheduled runs): trigger only when an entry is due ----
+    plan = None
+    if not key and not _is_apigw(event) and _plan_enabled():
+        with trace.span("PrewarmPlan"):
+            plan, due, warm = _plan_cycle(s3, lam, bucket, forecast_target, q90, series.end,
+                                          series.period, threshold, action == "init",
+                                          prewarm_parallel, trigger=trigger_path)
+        result["trigger"] = due > 0
+        result["plan"] = plan["entries"]
 
     # ---- Action handling ------------------------------------------------------
     if action == "init":
-        client_context = base64.b64encode(json.dumps(
-            {"custom": {"COLD_START": "false"}}
-        ).encode()).decode()
         target_to_invoke = _get_target(event) if _is_apigw(
             event) else os.environ.get("TARGET_FUNCTION", "target_function")
-
-        lam.invoke(
-            FunctionName=target_to_invoke,
-            InvocationType="Event",
-            ClientContext=client_context
-        )
+        if plan is not None:
+            # the plan already fired the entries due this cycle (if any)
+            warm = warm or {"wanted": 0, "live": 0, "live_after": 0, "requested": 0,
+                            "confirmed": 0, "environments": 0, "failed": 0}
+            warm["plan"] = plan["entries"]
+        else:
+            with trace.span("PrewarmInvoke"):
+                warm = _prewarm(s3, lam, bucket, target_to_invoke, max(q90),
+                                prewarm_parallel)
+        trace.add("PrewarmRequested", warm["requested"])
         body = {"status": "initialized",
-                "mode": mode, "target": target_to_invoke}
+                "mode": mode, "target": target_to_invoke, **warm}
     else:  # "check"
         body = result
+    trace.emit()
 
     # ---- API Gateway proxy response (with CORS) -------------------------------
     if _is_apigw(event):
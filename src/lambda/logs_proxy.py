@@ -1,9 +1,15 @@
 import os
+import re
+import gzip
 import json
-import boto3
+import time
+import heapq
+import base64
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
-logs = boto3.client("logs")
+from aws_clients import client
 
 # Map short names -> log group names (override via env)
 LOG_GROUPS = {
@@ -18,20 +24,344 @@ if orders_group:
     LOG_GROUPS["orders"] = orders_group  # enables /logs?group=orders
 
 
-def _response(status, body):
+# Many dashboards poll the same view every few seconds; identical requests
+# within LOGS_CACHE_TTL_S are answered from this environment's memory.
+CACHE_TTL_S = float(os.environ.get("LOGS_CACHE_TTL_S", "2"))
+CACHE_SIZE = int(os.environ.get("LOGS_CACHE_SIZE", "128"))
+_CACHE = OrderedDict()  # key -> (expires_at, response)
+
+# gzip bodies for clients that accept it. Off by default: API Gateway only
+# passes base64 bodies through as binary when binary media types are set up.
+GZIP = os.environ.get("LOGS_GZIP", "0") == "1"
+GZIP_MIN_BYTES = int(os.environ.get("LOGS_GZIP_MIN_BYTES", "1024"))
+
+
+def _wants_gzip(event):
+    if not GZIP:
+        return False
+    headers = event.get("headers") or {}
+    accept = next((v for k, v in headers.items() if k.lower() == "accept-encoding"), "")
+    return "gzip" in (accept or "")
+
+
+def _response(status, body, compress=False):
+    headers = {
+        "Content-Type": "application/json",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Headers": "Content-Type",
+        "Access-Control-Allow-Methods": "GET,OPTIONS",
+    }
+    text = json.dumps(body)
+    if compress and len(text) >= GZIP_MIN_BYTES:
+        headers["Content-Encoding"] = "gzip"
+        return {
+            "statusCode": status,
+            "headers": headers,
+            "body": base64.b64encode(gzip.compress(text.encode(), compresslevel=5)).decode(),
+            "isBase64Encoded": True,
+        }
+    return {"statusCode": status, "headers": headers, "body": text}
+
+
+def _cache_get(key):
+    hit = _CACHE.get(key)
+    if hit is None:
+        return None
+    if hit[0] < time.monotonic():
+        del _CACHE[key]
+        return None
+    _CACHE.move_to_end(key)
+    return hit[1]
+
+
+def _cache_put(key, response):
+    if CACHE_TTL_S <= 0:
+        return
+    _CACHE[key] = (time.monotonic() + CACHE_TTL_S, response)
+    _CACHE.move_to_end(key)
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+
+
+# ---- view=stats: server-side aggregation of target_function output ----------
+# Only lines that can feed the stats are fetched (status lines + EMF JSON).
+STATS_PATTERN = os.environ.get(
+    "STATS_PATTERN", '?"[WARM-COLD]" ?"ExecTimeMs" ?"ColdStartCostMs"')
+STATS_MAX_PAGES = int(os.environ.get("STATS_MAX_PAGES", "50"))
+# stop paging this long before the Lambda timeout and return what we have
+STATS_TIME_MARGIN_MS = int(os.environ.get("STATS_TIME_MARGIN_MS", "1500"))
+
+_STATUS_RE = re.compile(r"\[WARM-COLD\] AM (COLD|WARM)\b(.*)")
+_DONE_RE = re.compile(r"\[WARM-COLD\] done in ([0-9.]+) ms")
+
+
+def _pct(sorted_vals, q):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_vals:
+        return None
+    return round(sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))], 2)
+
+
+def _new_bucket():
+    return {"invocations": 0, "cold": 0, "jit_prewarmed": 0, "prewarm_pings": 0,
+            "emf_ms": [], "text_ms": [], "cold_cost_ms": []}
+
+
+def _scan(bucket, message):
+    """Fold one log line into a bucket's counters."""
+    if message.startswith("{"):
+        try:
+            emf = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(emf, dict):
+            return
+        if "ExecTimeMs" in emf:
+            bucket["emf_ms"].append(float(emf["ExecTimeMs"]))
+        if "ColdStartCostMs" in emf:
+            bucket["cold_cost_ms"].append(float(emf["ColdStartCostMs"]))
+        return
+    # Lambda prefixes log lines with time/level; search, don't match
+    m = _STATUS_RE.search(message)
+    if m:
+        bucket["invocations"] += 1
+        if m.group(1) == "COLD":
+            bucket["cold"] += 1
+        if "JIT prewarmed" in m.group(2):
+            bucket["jit_prewarmed"] += 1
+        return
+    if "PREWARM PING" in message:
+        bucket["prewarm_pings"] += 1
+        return
+    m = _DONE_RE.search(message)
+    if m:
+        bucket["text_ms"].append(float(m.group(1)))
+
+
+def _summary(b, exec_key):
+    ms = sorted(b[exec_key])
+    cost = b["cold_cost_ms"]
+    return {
+        "invocations": b["invocations"],
+        "cold": b["cold"],
+        "warm": b["invocations"] - b["cold"],
+        "cold_rate": round(b["cold"] / b["invocations"], 4) if b["invocations"] else None,
+        "jit_prewarmed": b["jit_prewarmed"],
+        "prewarm_pings": b["prewarm_pings"],
+        "p50_ms": _pct(ms, 0.50),
+        "p95_ms": _pct(ms, 0.95),
+        "p99_ms": _pct(ms, 0.99),
+        "cold_start_cost_ms": round(sum(cost) / len(cost), 2) if cost else None,
+    }
+
+
+def _stats(logs, group, start_ts, bucket_minutes, context):
+    """
+    Page through filter_log_events (newest pages are never held in memory:
+    each event is folded into its time bucket and dropped) and return
+    per-bucket counts, cold rate and exec-time percentiles.
+    """
+    width = bucket_minutes * 60000
+    buckets = {}
+    kwargs = {"logGroupName": group, "startTime": start_ts, "interleaved": True,
+              "limit": 10000}
+    if STATS_PATTERN:
+        kwargs["filterPattern"] = STATS_PATTERN
+    pages = scanned = 0
+    truncated = False
+    while True:
+        resp = logs.filter_log_events(**kwargs)
+        pages += 1
+        for ev in resp.get("events", []):
+            scanned += 1
+            slot = ev["timestamp"] - ev["timestamp"] % width
+            b = buckets.get(slot)
+            if b is None:
+                b = buckets[slot] = _new_bucket()
+            _scan(b, ev.get("message", ""))
+        token = resp.get("nextToken")
+        if not token:
+            break
+        remaining = (context.get_remaining_time_in_millis()
+                     if hasattr(context, "get_remaining_time_in_millis") else None)
+        if pages >= STATS_MAX_PAGES or (remaining is not None
+                                        and remaining < STATS_TIME_MARGIN_MS):
+            truncated = True
+            break
+        kwargs["nextToken"] = token
+
+    # EMF carries the exact exec time; fall back to the text lines if no EMF was seen
+    exec_key = "emf_ms" if any(b["emf_ms"] for b in buckets.values()) else "text_ms"
+    total = _new_bucket()
+    for b in buckets.values():
+        for k, v in b.items():
+            total[k] += v
+    return {
+        "group": group,
+        "view": "stats",
+        "bucket_minutes": bucket_minutes,
+        "pages": pages,
+        "scanned": scanned,
+        "truncated": truncated,
+        "totals": _summary(total, exec_key),
+        "buckets": [
+            {"ts": datetime.fromtimestamp(slot / 1000, tz=timezone.utc).isoformat(),
+             **_summary(buckets[slot], exec_key)}
+            for slot in sorted(buckets)
+        ],
+    }
+
+
+# ---- raw lines: window pages or incremental tail ------------------------------
+TAIL_MAX_PAGES = int(os.environ.get("TAIL_MAX_PAGES", "5"))
+
+
+def _item(ev):
     return {
-        "statusCode": status,
-        "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Content-Type",
-            "Access-Control-Allow-Methods": "GET,OPTIONS",
-        },
-        "body": json.dumps(body),
+        "ts": datetime.fromtimestamp(ev["timestamp"] / 1000, tz=timezone.utc).isoformat(),
+        "message": ev.get("message", ""),
+        "stream": ev.get("logStreamName", ""),
+        "id": ev.get("eventId", ""),
+    }
+
+
+def _cursor(events, since=None, after=()):
+    """
+    Where the next tail request should resume: the newest timestamp seen and
+    every event id at exactly that timestamp (so the boundary isn't re-sent).
+    """
+    if not events:
+        return {"since": since, "after": ",".join(after)} if since is not None else None
+    last = events[-1]["timestamp"]
+    ids = [e.get("eventId", "") for e in events if e["timestamp"] == last]
+    if last == since:
+        ids = list(after) + ids
+    return {"since": last, "after": ",".join(ids)}
+
+
+def _tail(logs, kwargs, since, after, limit):
+    """
+    Events newer than the (since, after) cursor: startTime is inclusive, so
+    events at `since` whose ids were already delivered are dropped here.
+    """
+    kwargs = dict(kwargs, startTime=since, limit=min(10000, limit))
+    seen = set(after)
+    events = []
+    for _ in range(TAIL_MAX_PAGES):
+        resp = logs.filter_log_events(**kwargs)
+        for ev in resp.get("events", []):
+            if ev["timestamp"] == since and ev.get("eventId") in seen:
+                continue
+            events.append(ev)
+        token = resp.get("nextToken")
+        if not token or len(events) >= limit:
+            break
+        kwargs["nextToken"] = token
+    return events[:limit]
+
+
+# ---- group=all / group=a,b: concurrent per-group fetch + timestamp merge ----
+MAX_WORKERS = int(os.environ.get("LOGS_MAX_WORKERS", "8"))
+
+
+def _selected_groups(group_key):
+    """[(key, log group)] for "all" or a comma list; None for a single group."""
+    if group_key == "all":
+        keys = list(LOG_GROUPS)
+    elif "," in group_key:
+        keys = [k.strip() for k in group_key.split(",") if k.strip() in LOG_GROUPS]
+    else:
+        return None
+    return [(k, LOG_GROUPS[k]) for k in dict.fromkeys(keys) if LOG_GROUPS[k]]
+
+
+def _encode_cursor(positions):
+    return base64.urlsafe_b64encode(
+        json.dumps(positions, separators=(",", ":")).encode()).decode()
+
+
+def _decode_cursor(token):
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return positions if isinstance(positions, dict) else {}
+    except Exception:
+        return {}
+
+
+class _GroupStream:
+    """One group's events in timestamp order, fetched a page at a time."""
+
+    def __init__(self, logs, key, group, kwargs, position):
+        self.logs = logs
+        self.key = key
+        self.since = position.get("since")
+        self.seen = set(position.get("after") or ())
+        self.kwargs = dict(kwargs, logGroupName=group)
+        if self.since is not None:
+            self.kwargs["startTime"] = self.since
+        self.page = []
+        self.error = None
+
+    def fetch(self):
+        try:
+            resp = self.logs.filter_log_events(**self.kwargs)
+        except Exception as e:  # one bad group shouldn't sink the others
+            self.error, resp = str(e), {}
+        self.page = [ev for ev in resp.get("events", [])
+                     if not (ev["timestamp"] == self.since and ev.get("eventId") in self.seen)]
+        self.kwargs["nextToken"] = resp.get("nextToken")
+        return self
+
+    def events(self):
+        while True:
+            for ev in self.page:
+                yield ev["timestamp"], self.key, ev
+            if not self.kwargs.get("nextToken"):
+                return
+            self.fetch()
+
+
+def _multi(logs, groups, kwargs, limit, token):
+    """
+    First pages of every group are fetched concurrently (latency ~ slowest
+    group), then the per-group streams are k-way merged by timestamp with a
+    heap; further pages are only fetched if the merge actually reaches them.
+    The cursor records, per group, the newest timestamp returned and the
+    event ids at it, so it works both as "next page" and as a tail cursor.
+    """
+    positions = _decode_cursor(token) if token else {}
+    streams = [_GroupStream(logs, key, group, kwargs, positions.get(key) or {})
+               for key, group in groups]
+    with ThreadPoolExecutor(max_workers=max(1, min(len(streams), MAX_WORKERS))) as pool:
+        list(pool.map(_GroupStream.fetch, streams))
+
+    order = {key: i for i, (key, _) in enumerate(groups)}
+    merged = heapq.merge(*(s.events() for s in streams), key=lambda x: (x[0], order[x[1]]))
+    items = []
+    for ts, key, ev in merged:
+        pos = positions.get(key)
+        if pos and pos.get("since") == ts:
+            pos["after"].append(ev.get("eventId", ""))
+        else:
+            positions[key] = {"since": ts, "after": [ev.get("eventId", "")]}
+        items.append(dict(_item(ev), group=key))
+        if len(items) >= limit:
+            break
+    more = len(items) >= limit and next(merged, None) is not None
+    cursor = _encode_cursor(positions)
+    return {
+        "group": ",".join(key for key, _ in groups),
+        "count": len(items),
+        "items": items,
+        "next": cursor if more else None,
+        "cursor": cursor,
+        "errors": {s.key: s.error for s in streams if s.error},
     }
 
 
 def lambda_handler(event, context):
+    logs = client("logs")
+
     # Query params
     qsp = (event.get("queryStringParameters") or {})
     group_key = (qsp.get("group") or "target").lower()
@@ -47,6 +377,29 @@ def lambda_handler(event, context):
     pattern = qsp.get("pattern")  # None means no server-side filter
     limit = int(qsp.get("limit", "100"))
     next_token = qsp.get("next")  # pagination
+    # tail mode: only events after the cursor returned by the previous call
+    since = int(qsp["since"]) if qsp.get("since") else None
+    after = tuple(x for x in (qsp.get("after") or "").split(",") if x)
+    view = (qsp.get("view") or "").lower()
+
+    compress = _wants_gzip(event)
+    ckey = (group_key, view, pattern, minutes, limit, next_token, since, after,
+            qsp.get("bucket"), qsp.get("cursor"), compress)
+    cached = _cache_get(ckey)
+    if cached is not None:
+        return cached
+
+    if view == "stats":
+        bucket_minutes = max(1, int(qsp.get("bucket", str(max(1, minutes // 15)))))
+        try:
+            out = _response(200, _stats(logs, group, start_ts, bucket_minutes, context),
+                            compress)
+        except logs.exceptions.ResourceNotFoundException:
+            return _response(404, {"error": f"log group not found: {group}", "group": group})
+        except Exception as e:
+            return _response(500, {"error": str(e)})
+        _cache_put(ckey, out)
+        return out
 
     kwargs = {
         "logGroupName": group,
@@ -59,24 +412,34 @@ def lambda_handler(event, context):
     if next_token:
         kwargs["nextToken"] = next_token
 
+    groups = _selected_groups(group_key)
+    if groups is not None:
+        # composite cursor: `next` to page forward, `cursor` to tail
+        kwargs.pop("logGroupName")
+        kwargs.pop("nextToken", None)
+        out = _response(200, _multi(logs, groups, kwargs, limit,
+                                    next_token or qsp.get("cursor")), compress)
+        _cache_put(ckey, out)
+        return out
+
     try:
-        resp = logs.filter_log_events(**kwargs)
+        if since is not None and not next_token:
+            events, token = _tail(logs, kwargs, since, after, limit), None
+        else:
+            resp = logs.filter_log_events(**kwargs)
+            events, token = resp.get("events", []), resp.get("nextToken")
     except logs.exceptions.ResourceNotFoundException:
         return _response(404, {"error": f"log group not found: {group}", "group": group})
     except Exception as e:
         return _response(500, {"error": str(e)})
 
-    items = []
-    for ev in resp.get("events", []):
-        items.append({
-            "ts": datetime.fromtimestamp(ev["timestamp"] / 1000, tz=timezone.utc).isoformat(),
-            "message": ev.get("message", ""),
-            "stream": ev.get("logStreamName", ""),
-        })
-
-    return _response(200, {
+    items = [_item(ev) for ev in events]
+    out = _response(200, {
         "group": group,
         "count": len(items),
         "items": items,
-        "next": resp.get("nextToken"),  # pass back for pagination
-    })
+        "next": token,  # pass back for pagination
+        "cursor": _cursor(events, since, after),  # pass back as since/after to tail
+    }, compress)
+    _cache_put(ckey, out)
+    return out
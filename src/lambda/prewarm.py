@@ -0,0 +1,93 @@
+import json
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def environments_needed(peak_per_minute, duration_ms, cap, headroom=1.0):
+    """
+    Concurrent environments for a forecast peak (Little's law):
+    invocations/sec x seconds per invocation, times headroom, in [1, cap].
+    """
+    concurrency = (max(0.0, peak_per_minute) / 60.0) * (duration_ms / 1000.0) * headroom
+    return max(1, min(int(cap), int(math.ceil(concurrency))))
+
+
+def plan_prewarms(start, period, peaks, threshold, duration_ms, cap, headroom=1.0,
+                  lead_s=1.0, idle_expiry_s=600, warm_count=0, warm_until=0, trigger=None):
+    """
+    Turn a per-step p90 path into a schedule of [{"at", "envs", "step"}].
+
+    Step i is the minute starting at start + i * period. Every step at or
+    above `threshold` needs environments_needed(p90) warm environments by
+    then. An entry fires `lead_s` (one cold start) before its step and keeps
+    `envs` environments warm until at + idle_expiry_s, so a later step only
+    gets its own entry if it needs more environments or the earlier ones
+    will have expired. `warm_count` / `warm_until` describe what is already
+    warm from earlier cycles. `trigger` (default: `peaks`) is the path compared
+    with the threshold, when that isn't the one used for sizing.
+    """
+    entries = []
+    for i, peak in enumerate(peaks):
+        if (peak if trigger is None else trigger[i]) < threshold:
+            continue
+        need = environments_needed(peak, duration_ms, cap, headroom)
+        t = start + i * period
+        if need <= warm_count and t < warm_until:
+            continue
+        at = t - lead_s
+        entries.append({"at": at, "envs": need, "step": i})
+        warm_count, warm_until = need, at + idle_expiry_s
+    return entries
+
+
+def fan_out(lam, function_name, count, client_context, payload=None,
+            max_workers=None, jitter_ms=0):
+    """
+    Fire `count` overlapping RequestResponse invokes so each one needs its own
+    execution environment (queued Event invokes would reuse one warm env).
+    All of them must be in flight together - a second wave would land on the
+    environments the first one just warmed - so the pool is `count` threads
+    unless `max_workers` caps it. `confirmed` counts distinct environments
+    (by the env_id the target returns), not successful responses.
+    Returns counts plus the first few error strings.
+    """
+    body = json.dumps(payload or {})
+
+    def _one(_):
+        if jitter_ms:
+            time.sleep(random.uniform(0, jitter_ms) / 1000.0)
+        try:
+            resp = lam.invoke(
+                FunctionName=function_name,
+                InvocationType="RequestResponse",
+                ClientContext=client_context,
+                Payload=body
+            )
+            if resp.get("FunctionError"):
+                return None, f"function error: {resp['FunctionError']}"
+            out = json.loads(resp["Payload"].read() or b"{}")
+            return out, None
+        except Exception as e:
+            return None, str(e)
+
+    ok, errors = [], []
+    if count > 0:
+        workers = count if max_workers is None else max(1, min(max_workers, count))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for out, err in pool.map(_one, range(count)):
+                if err:
+                    errors.append(err)
+                else:
+                    ok.append(out)
+    env_ids = {r.get("env_id") for r in ok if isinstance(r, dict) and r.get("env_id")}
+    anonymous = sum(1 for r in ok if not (isinstance(r, dict) and r.get("env_id")))
+    return {
+        "requested": count,
+        "confirmed": len(env_ids) + anonymous,  # responses without an env_id count as one each
+        "env_ids": sorted(env_ids),
+        "failed": len(errors),
+        "errors": errors[:5],
+        "responses": ok,
+    }
@@ -0,0 +1,105 @@
+import math
+from array import array
+from datetime import datetime, timezone
+
+from series_store import Series
+
+# One cleaning pipeline for every consumer (collector test data, init_manager
+# demo series, training CSVs), so they all see the same regular 1-minute grid:
+#   parse timestamps once -> O(n) order check (sort only if needed) ->
+#   snap to grid + aggregate duplicates -> fill gaps with 0 -> clip -> cast
+
+
+def to_epoch(value):
+    """Epoch seconds from an ISO string / datetime / number; None if unparseable."""
+    if isinstance(value, (int, float)):
+        return int(value) if math.isfinite(value) else None  # blank CSV cells are NaN
+    try:
+        dt = value if isinstance(value, datetime) else datetime.fromisoformat(
+            str(value).strip())
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def split_points(points):
+    """[{"start": ..., "target": [v, ...]}, ...] -> (starts, values); bad rows dropped."""
+    starts, values = [], []
+    for d in points if isinstance(points, list) else []:
+        if (isinstance(d, dict) and "start" in d and isinstance(d.get("target"), list)
+                and d["target"]):
+            starts.append(d["start"])
+            values.append(d["target"][0])
+    return starts, values
+
+
+def _median(sorted_vals):
+    n = len(sorted_vals)
+    mid = n // 2
+    return sorted_vals[mid] if n % 2 else (sorted_vals[mid - 1] + sorted_vals[mid]) / 2.0
+
+
+def prepare(starts, values, period=60, agg="sum", typecode="i",
+            min_value=0.0, clip_mad=None):
+    """
+    Clean (timestamp, value) columns into one regular Series.
+
+    - agg: how points landing in the same slot combine ("sum" like a pandas
+      resample, or "last" = later rows overwrite earlier ones)
+    - min_value: floor applied to every value (counts can't be negative)
+    - clip_mad: if set, cap values at median + clip_mad * 1.4826 * MAD
+    - typecode: 'i' rounds to int32, 'f' keeps float32
+    """
+    ts, vs = [], []
+    for s, v in zip(starts, values):
+        e = to_epoch(s)
+        if e is None or v is None:
+            continue
+        try:
+            v = float(v)
+        except (TypeError, ValueError):
+            continue
+        if v != v:  # NaN
+            continue
+        ts.append(e - e % period)
+        vs.append(v)
+    if not ts:
+        return Series(0, period, array(typecode))
+
+    # O(n) monotonicity check; only unordered input pays for a (stable) sort
+    if any(b < a for a, b in zip(ts, ts[1:])):
+        order = sorted(range(len(ts)), key=ts.__getitem__)
+        ts = [ts[i] for i in order]
+        vs = [vs[i] for i in order]
+
+    lo = ts[0]
+    out = [0.0] * ((ts[-1] - lo) // period + 1)
+    if agg == "sum":
+        for t, v in zip(ts, vs):
+            out[(t - lo) // period] += v
+    else:
+        for t, v in zip(ts, vs):
+            out[(t - lo) // period] = v
+
+    hi = None
+    if clip_mad:
+        srt = sorted(out)
+        med = _median(srt)
+        mad = _median(sorted(abs(x - med) for x in srt))
+        if mad > 0:
+            hi = med + clip_mad * 1.4826 * mad
+    if min_value is not None:
+        out = [x if x >= min_value else min_value for x in out]
+    if hi is not None:
+        out = [x if x <= hi else hi for x in out]
+
+    if typecode == "i":
+        out = [int(round(x)) for x in out]
+    return Series(lo, period, array(typecode, out))
+
+
+def prepare_points(points, **kwargs):
+    """prepare() for the legacy JSON list shape."""
+    return prepare(*split_points(points), **kwargs)
@@ -0,0 +1,305 @@
+import json
+import logging
+import mmap
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+# ---- binary series format -----------------------------------------------------
+# 24-byte little-endian header, then `count` contiguous int32 ('i') / float32 ('f')
+# values, one per `period` seconds starting at `start` (epoch seconds, UTC).
+#   magic(4s) version(B) typecode(c) pad(2x) start(q) period(I) count(I)
+_HEADER = struct.Struct("<4sBc2xqII")
+HEADER_SIZE = _HEADER.size
+MAGIC = b"CSMS"
+FORMAT_VERSION = 1
+_LITTLE = sys.byteorder == "little"
+
+
+def series_prefix(function_name, metric="Invocations", root="series"):
+    """S3 prefix holding the shards + manifest of one (function, metric) series."""
+    return f"{root.rstrip('/')}/{function_name}/{metric}"
+
+
+def iso_from_epoch(epoch):
+    """Epoch seconds -> 'YYYY-MM-DD HH:MM:SS' (UTC, no tz), the DeepAR 'start' shape."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+def epoch_from_iso(value):
+    """'YYYY-MM-DD HH:MM:SS' (naive = UTC) or any ISO string -> epoch seconds."""
+    dt = datetime.fromisoformat(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+class Series:
+    """A regular series: `values[i]` is the point at `start + i * period`."""
+
+    __slots__ = ("start", "period", "values")
+
+    def __init__(self, start, period, values):
+        self.start = int(start)
+        self.period = int(period)
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def end(self):
+        """Epoch of the slot just past the last value."""
+        return self.start + len(self.values) * self.period
+
+    @property
+    def start_iso(self):
+        return iso_from_epoch(self.start)
+
+    def to_points(self):
+        """Legacy JSON shape: [{"start": ..., "target": [v]}, ...] (export only)."""
+        return [{"start": iso_from_epoch(self.start + i * self.period), "target": [v]}
+                for i, v in enumerate(self.values.tolist())]
+
+
+def encode_series(series, typecode):
+    """Series -> header + packed values."""
+    values = series.values
+    if not isinstance(values, array) or values.typecode != typecode:
+        values = array(typecode, values)
+    if not _LITTLE:
+        values = array(typecode, values)
+        values.byteswap()
+    head = _HEADER.pack(MAGIC, FORMAT_VERSION, typecode.encode(),
+                        series.start, series.period, len(values))
+    return head + values.tobytes()
+
+
+def decode_series(buf):
+    """
+    Header + packed values -> Series. On little-endian hosts `values` is a
+    zero-copy memoryview over `buf` (bytes, bytearray or mmap).
+    """
+    magic, version, typecode, start, period, count = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"not a series buffer (magic={magic!r}, version={version})")
+    tc = typecode.decode()
+    body = memoryview(buf)[HEADER_SIZE:HEADER_SIZE + count * 4]
+    if _LITTLE:
+        values = body.cast(tc)
+    else:
+        values = array(tc, body.tobytes())
+        values.byteswap()
+    return Series(start, period, values)
+
+
+def open_series_file(path):
+    """Memory-map a local series file; values are paged in lazily by the OS."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return decode_series(mm)
+
+
+def _shard_id(epoch):
+    """epoch -> '2025-08-18T20' (one shard per UTC hour)."""
+    return time.strftime("%Y-%m-%dT%H", time.gmtime(epoch))
+
+
+class SeriesStore:
+    """
+    Append-only series on S3, partitioned into hourly shards.
+
+    Layout under `prefix`:
+      manifest.json       -> {"version", "typecode", "period", "watermark", "total", "shards",
+                              optional "checked" (see mark_checked) and "source_etag"}
+      <YYYY-MM-DDTHH>.bin -> one binary series (see encode_series) per UTC hour
+
+    Writers only rewrite the shard(s) the new points fall into (normally just
+    the open hour) plus the small manifest, so per-run cost stays flat as
+    history grows. Readers use `cursor()` / `tail(n)` to walk backwards from
+    the newest shard and stop as soon as they have enough points. Missing
+    minutes read back as 0.
+    """
+
+    def __init__(self, s3_client, bucket, prefix, retention_shards=None,
+                 typecode="i", period=60):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.retention_shards = retention_shards
+        self.typecode = typecode
+        self.period = period
+        self._manifest = None
+        # S3 payload sizes, for per-run tracing (tracing.py)
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    # ---- manifest -------------------------------------------------------------
+    def _key(self, name):
+        return f"{self.prefix}/{name}"
+
+    def manifest(self):
+        if self._manifest is None:
+            try:
+                obj = self.s3.get_object(
+                    Bucket=self.bucket, Key=self._key(MANIFEST_NAME))
+                raw = obj["Body"].read()
+                self.bytes_read += len(raw)
+                self._manifest = json.loads(raw)
+                self.typecode = self._manifest.get("typecode", self.typecode)
+                self.period = self._manifest.get("period", self.period)
+            except Exception:
+                self._manifest = {"version": 1, "typecode": self.typecode,
+                                  "period": self.period, "watermark": None,
+                                  "total": 0, "shards": []}
+        return self._manifest
+
+    def _write_manifest(self):
+        body = json.dumps(self._manifest)
+        self.bytes_written += len(body)
+        self.s3.put_object(Bucket=self.bucket, Key=self._key(MANIFEST_NAME), Body=body)
+
+    # ---- shards ---------------------------------------------------------------
+    def _read_shard(self, shard):
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=shard["key"])
+            raw = obj["Body"].read()
+            self.bytes_read += len(raw)
+            return decode_series(raw)
+        except Exception:
+            logger.info("Shard %s missing; treating as empty", shard["key"])
+            return Series(shard.get("start", 0), self.period, array(self.typecode))
+
+    def append(self, pairs):
+        """
+        Merge (epoch_seconds, value) pairs into their shards (new overwrites
+        old in the same slot). Returns the number of pairs written.
+        """
+        manifest = self.manifest()
+        p = self.period
+
+        by_shard = {}
+        for ts, v in pairs:
+            ts = int(ts) - int(ts) % p
+            by_shard.setdefault(_shard_id(ts), []).append((ts, v))
+        if not by_shard:
+            return 0
+
+        shards = {s["id"]: s for s in manifest["shards"]}
+        for sid in sorted(by_shard):
+            new = by_shard[sid]
+            old = self._read_shard(shards[sid]) if sid in shards else None
+
+            lo = min(ts for ts, _ in new)
+            hi = max(ts for ts, _ in new) + p
+            if old is not None and len(old):
+                lo, hi = min(lo, old.start), max(hi, old.end)
+            values = array(self.typecode, bytes(4 * ((hi - lo) // p)))
+            if old is not None and len(old):
+                off = (old.start - lo) // p
+                values[off:off + len(old)] = array(self.typecode, old.values)
+            for ts, v in new:
+                values[(ts - lo) // p] = v
+
+            shard = shards.get(sid) or {"id": sid, "key": self._key(f"{sid}.bin")}
+            body = encode_series(Series(lo, p, values), self.typecode)
+            self.bytes_written += len(body)
+            self.s3.put_object(Bucket=self.bucket, Key=shard["key"], Body=body)
+            shard.update({"start": lo, "end": hi, "count": len(values)})
+            shards[sid] = shard
+
+        ordered = [shards[k] for k in sorted(shards)]
+        if self.retention_shards and len(ordered) > self.retention_shards:
+            expired = ordered[:-self.retention_shards]
+            ordered = ordered[-self.retention_shards:]
+            for shard in expired:
+                try:
+                    self.s3.delete_object(Bucket=self.bucket, Key=shard["key"])
+                except Exception as e:
+                    logger.info("Could not delete %s (%s)", shard["key"], e)
+            logger.info("Retention dropped %d shard(s)", len(expired))
+
+        manifest["shards"] = ordered
+        manifest["total"] = sum(s["count"] for s in ordered)
+        manifest["watermark"] = iso_from_epoch(ordered[-1]["end"] - p) if ordered else None
+        self._write_manifest()
+        n = sum(len(v) for v in by_shard.values())
+        logger.info("Appended %d points to %d shard(s) under s3://%s/%s",
+                    n, len(by_shard), self.bucket, self.prefix)
+        return n
+
+    def mark_checked(self, epoch):
+        """
+        Record that the source had nothing newer than `epoch` (e.g. a function
+        with no invocations), so the next fetch can start there instead of at
+        an old watermark or a full backfill.
+        """
+        manifest = self.manifest()
+        manifest["checked"] = iso_from_epoch(int(epoch) - int(epoch) % self.period)
+        self._write_manifest()
+
+    def fetched_through(self):
+        """The later of the watermark and the last empty check (ISO), or None."""
+        m = self.manifest()
+        marks = [x for x in (m.get("watermark"), m.get("checked")) if x]
+        return max(marks, key=epoch_from_iso) if marks else None
+
+    # ---- readers --------------------------------------------------------------
+    def cursor(self):
+        """Yield shards newest-first, each as a Series."""
+        for shard in reversed(self.manifest()["shards"]):
+            yield self._read_shard(shard)
+
+    def _read_from(self, shard, first):
+        """
+        Slots [first:] of a shard. Slots are fixed-width, so a ranged GET can
+        skip the header and everything before `first`.
+        """
+        if first <= 0:
+            return self._read_shard(shard)
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=shard["key"],
+                                     Range=f"bytes={HEADER_SIZE + 4 * first}-")
+            raw = obj["Body"].read()
+            self.bytes_read += len(raw)
+            values = array(self.typecode)
+            values.frombytes(raw)
+            if not _LITTLE:
+                values.byteswap()
+        except Exception:
+            logger.info("Shard %s missing; treating as empty", shard["key"])
+            values = array(self.typecode)
+        return Series(shard["start"] + first * self.period, self.period, values)
+
+    def tail(self, n):
+        """
+        Return the last `n` slots (ending at the watermark) as one Series.
+        Only shards overlapping that window are fetched, and the oldest of
+        them only from the first slot needed, so cost is O(n), not O(history).
+        """
+        shards = self.manifest()["shards"]
+        p = self.period
+        if n <= 0 or not shards:
+            return Series(0, p, array(self.typecode))
+        end = shards[-1]["end"]
+        lo = max(end - n * p, shards[0]["start"])
+        values = array(self.typecode, bytes(4 * ((end - lo) // p)))
+        reads = 0
+        for shard in reversed(shards):
+            if shard["end"] <= lo:
+                break
+            part = self._read_from(shard, (lo - shard["start"]) // p)
+            reads += 1
+            a, b = max(part.start, lo), min(part.end, end)
+            if b > a:
+                values[(a - lo) // p:(b - lo) // p] = array(
+                    self.typecode, part.values[(a - part.start) // p:(b - part.start) // p])
+        logger.info("Tail read %d slots from %d shard(s) under %s",
+                    len(values), reads, self.prefix)
+        return Series(lo, p, values)
@@ -0,0 +1,83 @@
+import json
+import os
+import time
+from contextlib import nullcontext
+
+# Per-stage timing for the controller Lambdas, flushed as one Embedded Metric
+# Format line per invocation (same stdout mechanism as target_function).
+# TRACE_EMF=0 turns it off: span() then hands back one shared no-op context
+# and add() returns immediately, so the instrumented code costs ~nothing.
+NAMESPACE = os.environ.get("TRACE_NAMESPACE", "ColdStartDemo/ControlPlane")
+_NOOP = nullcontext()
+
+
+def enabled():
+    return os.environ.get("TRACE_EMF", "1") != "0"
+
+
+class _Span:
+    __slots__ = ("trace", "stage", "t0")
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.t0) * 1000.0
+        key = f"{self.stage}Ms"
+        self.trace.values[key] = self.trace.values.get(key, 0.0) + ms
+        self.trace.units[key] = "Milliseconds"
+        return False
+
+
+class Trace:
+    """
+    Collects stage durations and sizes for one invocation:
+
+        trace = Trace("init_manager")
+        with trace.span("SeriesRead"):
+            ...
+        trace.add("SeriesLength", len(values))
+        trace.emit()
+
+    Repeated spans of the same stage add up (e.g. one S3 put per shard).
+    """
+
+    def __init__(self, service, **dimensions):
+        self.enabled = enabled()
+        self.dimensions = {"Service": service, **dimensions}
+        self.values = {}
+        self.units = {}
+        self.t0 = time.perf_counter()
+
+    def span(self, stage):
+        return _Span(self, stage) if self.enabled else _NOOP
+
+    def add(self, name, value, unit="Count"):
+        """Record a size/count; Bytes or Count. Repeats accumulate."""
+        if not self.enabled:
+            return
+        self.values[name] = self.values.get(name, 0) + value
+        self.units[name] = unit
+
+    def emit(self):
+        if not self.enabled:
+            return
+        self.values["TotalMs"] = (time.perf_counter() - self.t0) * 1000.0
+        self.units["TotalMs"] = "Milliseconds"
+        print(json.dumps({
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [list(self.dimensions)],
+                    "Metrics": [{"Name": k, "Unit": u} for k, u in self.units.items()],
+                }],
+            },
+            **self.dimensions,
+            **self.values,
+        }))  # EMF is picked up from stdout
@@ -0,0 +1,86 @@
+import json
+import time
+
+# Estimated live warm pool of one target function. target_function stamps
+# every EMF line (invocation, pre-warm ping, init anatomy) with its EnvId, so
+# the log group doubles as an activity feed: an environment seen within the
+# idle expiry is assumed still warm. The registry ({env_id: last seen}) and a
+# log cursor live in one small S3 object, so each cycle only reads new lines.
+
+
+class WarmPool:
+    def __init__(self, last_seen=None, cursor_ms=0):
+        self.last_seen = dict(last_seen or {})  # env_id -> epoch seconds
+        self.cursor_ms = cursor_ms               # newest log timestamp already read
+
+    def observe(self, env_id, ts):
+        if env_id and ts > self.last_seen.get(env_id, 0):
+            self.last_seen[env_id] = ts
+
+    def expire(self, now, idle_s):
+        """Drop environments idle for longer than `idle_s`; returns how many."""
+        dead = [e for e, ts in self.last_seen.items() if now - ts >= idle_s]
+        for e in dead:
+            del self.last_seen[e]
+        return len(dead)
+
+    def live(self, now, idle_s):
+        return sum(1 for ts in self.last_seen.values() if now - ts < idle_s)
+
+    def to_json(self):
+        return json.dumps({"cursor_ms": self.cursor_ms, "last_seen": self.last_seen})
+
+    @classmethod
+    def from_json(cls, raw):
+        d = json.loads(raw)
+        return cls(d.get("last_seen"), d.get("cursor_ms", 0))
+
+
+def env_activity(events):
+    """(env_id, epoch seconds) for every log event that is an EMF line with an EnvId."""
+    for ev in events:
+        msg = ev.get("message", "")
+        if '"EnvId"' not in msg:
+            continue
+        try:
+            env_id = json.loads(msg[msg.index("{"):]).get("EnvId")
+        except ValueError:
+            continue
+        if env_id:
+            yield env_id, ev["timestamp"] / 1000.0
+
+
+def load_pool(s3, bucket, key):
+    try:
+        return WarmPool.from_json(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+    except Exception:
+        return WarmPool()
+
+
+def save_pool(s3, bucket, key, pool):
+    s3.put_object(Bucket=bucket, Key=key, Body=pool.to_json())
+
+
+def refresh_from_logs(pool, logs, log_group, idle_s, now=None, max_pages=10):
+    """
+    Fold log lines newer than the pool's cursor (and no older than one idle
+    expiry) into `pool`, then age out expired environments. Returns the
+    number of events read.
+    """
+    now = time.time() if now is None else now
+    kwargs = {"logGroupName": log_group, "filterPattern": '"EnvId"', "limit": 10000,
+              "startTime": max(pool.cursor_ms, int((now - idle_s) * 1000))}
+    read = 0
+    for _ in range(max_pages):
+        resp = logs.filter_log_events(**kwargs)
+        events = resp.get("events", [])
+        read += len(events)
+        for env_id, ts in env_activity(events):
+            pool.observe(env_id, ts)
+        if events:
+            pool.cursor_ms = max(pool.cursor_ms, max(e["timestamp"] for e in events))
+        if not resp.get("nextToken"):
+            break
+        kwargs["nextToken"] = resp["nextToken"]
+    pool.expire(now, idle_s)
+    return read
@@ -0,0 +1,40 @@
+import os
+import zipfile
+
+# Rebuilds src/lambda/<handler>.zip (what Terraform deploys) from source.
+# Each handler is bundled with the shared modules it imports.
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda")
+
+PACKAGES = {
+    "data_collector": ["data_collector.py", "accuracy.py", "aws_clients.py", "series_store.py",
+                       "series_prep.py", "tracing.py"],
+    "init_manager": ["init_manager.py", "accuracy.py", "aws_clients.py", "series_store.py",
+                     "series_prep.py", "forecast_cache.py", "forecasters.py", "prewarm.py",
+                     "tracing.py", "warm_pool.py"],
+    "logs_proxy": ["logs_proxy.py", "aws_clients.py"],
+    "target_function": ["target_function.py"],
+}
+
+# fixed timestamp so unchanged sources produce byte-identical zips
+_ZIP_DATE = (2025, 1, 1, 0, 0, 0)
+
+
+def build(name, files):
+    path = os.path.join(LAMBDA_DIR, f"{name}.zip")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for fname in files:
+            info = zipfile.ZipInfo(fname, date_time=_ZIP_DATE)
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(os.path.join(LAMBDA_DIR, fname), "rb") as f:
+                zf.writestr(info, f.read())
+    print(f"Built {os.path.relpath(path)} ({', '.join(files)})")
+
+
+def main():
+    for name, files in PACKAGES.items():
+        build(name, files)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
 import boto3
 import time
+import hashlib
 import pandas as pd
 import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# shared with the Lambdas (binary series format written by data_collector)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+from series_prep import prepare  # noqa: E402
+from series_store import iso_from_epoch, open_series_file, series_prefix  # noqa: E402
 
 region = "us-east-1"
 sagemaker = boto3.client("sagemaker", region_name=region)
@@ -23,141 +31,381 @@ role_arn = (
 
 training_image = "522234722520.dkr.ecr.us-east-1.amazonaws.com/forecasting-deepar:latest"
 
+# functions whose collector Invocations series also become training lines (comma list)
+train_series = [x.strip() for x in os.environ.get("TRAIN_SERIES", "").split(",") if x.strip()]
+
+hyperparameters = {
+    "time_freq": "min",
+    "context_length": "120",
+    "prediction_length": "12",
+    "likelihood": "negative-binomial",
+    "num_cells": "50",
+    "epochs": "100"
+}
+
+# source ETag/size -> output hash per converted file, plus the last successful
+# job's dataset hash + artifact. Kept outside deepar-json/ so it isn't trained on.
+dataset_manifest_key = os.environ.get("DATASET_MANIFEST_KEY", "manifests/deepar-dataset.json")
+# FORCE_RETRAIN=1 trains even if the dataset matches the last successful job
+force_retrain = os.environ.get("FORCE_RETRAIN", "0") == "1"
+
+
+# rows per pandas chunk; peak memory is bounded by this, not by the CSV size
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", "200000"))
+# conversion processes (default: one per core)
+TRAIN_WORKERS = int(os.environ.get("TRAIN_WORKERS", "0")) or os.cpu_count() or 1
+TIME_COL, TARGET_COL = "minute", "invocation_count"
+
+
+def _epochs(column):
+    """
+    Timestamps -> epoch seconds (NaN where unparseable). pandas accepts more
+    formats than fromisoformat (e.g. "2025/01/01 00:00"), so parse here and
+    hand prepare() plain numbers.
+    """
+    ts = pd.to_datetime(column, utc=True, errors="coerce")
+    return ((ts - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).tolist()
+
+
+class _OutOfOrder(Exception):
+    """A chunk starts before minutes that were already written."""
+
+
+class _JsonLineWriter:
+    """
+    Streams one DeepAR line {"start": ..., "target": [...]} from per-chunk
+    Series on the 1-minute grid. The last minute of each chunk stays open
+    (`value`) because the next chunk may carry more rows for it; gaps
+    between chunks are written as 0.
+    """
+
+    def __init__(self, f, period=60):
+        self.f = f
+        self.period = period
+        self.slot = None   # epoch of the open minute
+        self.value = 0.0   # its running sum
+        self.count = 0
+
+    def add(self, series):
+        if not len(series):
+            return
+        p = self.period
+        values = series.values.tolist()
+        if self.slot is None:
+            self.f.write('{"start": "%s", "target": [' % iso_from_epoch(series.start))
+        elif series.start < self.slot:
+            raise _OutOfOrder(iso_from_epoch(series.start))
+        elif series.start == self.slot:
+            self.value += values[0]
+            values = values[1:]
+        else:
+            self._emit([self.value] + [0.0] * ((series.start - self.slot) // p - 1))
+        if self.slot is None or series.start > self.slot:
+            self.slot, self.value = series.start, values[0]
+            values = values[1:]
+        if values:
+            self._emit([self.value] + values[:-1])
+            self.slot += len(values) * p
+            self.value = values[-1]
+
+    def _emit(self, values):
+        text = ", ".join(str(int(round(v))) for v in values)
+        self.f.write(text if not self.count else ", " + text)
+        self.count += len(values)
+
+    def close(self):
+        """Flush the open minute and end the line; False if nothing was written."""
+        if self.slot is None:
+            return False
+        self._emit([self.value])
+        self.f.write("]}\n")
+        return True
+
+
+def _upload(path, json_key):
+    """Upload a converted file; returns its sha256 (the dataset manifest's output hash)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    s3.upload_file(path, bucket, json_key)
+    return h.hexdigest()
+
+
+def _tmp(name):
+    # per-process names: conversions run in parallel
+    return f"/tmp/{os.getpid()}-{name}"
+
 
 def convert_csv_to_deepar_json(csv_key, json_key):
-    """Download CSV from S3, convert to DeepAR JSON Lines, upload to S3."""
-    tmp_csv = "/tmp/train.csv"
-    tmp_json = "/tmp/train.json"
+    """
+    Download CSV from S3, stream it into DeepAR JSON Lines, upload to S3.
+
+    Rows are read CSV_CHUNK_ROWS at a time and cleaned with the shared
+    pipeline (series_prep.py: per-minute sums, gaps = 0). A CSV whose rows
+    go back in time across chunks falls back to one whole-file pass.
+    """
+    tmp_csv = _tmp("train.csv")
+    tmp_json = _tmp("train.json")
 
     s3.download_file(bucket, csv_key, tmp_csv)
     print(f"Downloaded {csv_key} from S3.")
 
-    df = pd.read_csv(tmp_csv)
-    time_col, target_col = "minute", "invocation_count"
-
-    if time_col not in df.columns or target_col not in df.columns:
+    columns = list(pd.read_csv(tmp_csv, nrows=0).columns)
+    if TIME_COL not in columns or TARGET_COL not in columns:
         raise ValueError(
-            f"CSV must contain '{time_col}' and '{target_col}'. "
-            f"Got {list(df.columns)}"
+            f"CSV must contain '{TIME_COL}' and '{TARGET_COL}'. "
+            f"Got {columns}"
         )
 
-    # Parse timestamps, sort, enforce 1-minute regularity, integer counts
-    df[time_col] = pd.to_datetime(df[time_col], utc=True, errors="coerce")
-    df = df.dropna(subset=[time_col, target_col]).sort_values(time_col)
-    df = (
-        df.set_index(time_col)
-        # or .mean() if that better matches your metric
-          .resample("1min").sum()
-          .fillna(0)
-    )
-    df[target_col] = df[target_col].astype(int)
+    try:
+        with open(tmp_json, "w") as f:
+            writer = _JsonLineWriter(f)
+            for chunk in pd.read_csv(tmp_csv, usecols=[TIME_COL, TARGET_COL],
+                                     chunksize=CSV_CHUNK_ROWS):
+                writer.add(prepare(_epochs(chunk[TIME_COL]), chunk[TARGET_COL].tolist(),
+                                   agg="sum", typecode="f"))
+            ok = writer.close()
+    except _OutOfOrder as e:
+        print(f"{csv_key}: rows out of order across chunks (at {e}); converting in one pass")
+        df = pd.read_csv(tmp_csv, usecols=[TIME_COL, TARGET_COL])
+        series = prepare(_epochs(df[TIME_COL]), df[TARGET_COL].tolist(), agg="sum")
+        ok = bool(len(series))
+        with open(tmp_json, "w") as f:
+            f.write(json.dumps({"start": series.start_iso,
+                                "target": series.values.tolist()}) + "\n")
+    if not ok:
+        raise ValueError(f"No usable rows in {csv_key}")
+
+    digest = _upload(tmp_json, json_key)
+    os.remove(tmp_csv)
+    os.remove(tmp_json)
+    print(f"Uploaded DeepAR JSON to s3://{bucket}/{json_key}")
+    return digest
+
 
-    start_value = df.index[0].tz_convert(None).strftime("%Y-%m-%d %H:%M:%S")
-    entry = {"start": start_value, "target": df[target_col].tolist()}
+def convert_series_to_deepar_json(prefix, json_key):
+    """
+    Stream a collector series (binary hourly shards) into one DeepAR JSON line.
+    Each shard is downloaded to /tmp and memory-mapped; gaps between shards are 0.
+    """
+    tmp_shard = _tmp("shard.bin")
+    tmp_json = _tmp("series.json")
 
+    manifest = json.loads(
+        s3.get_object(Bucket=bucket, Key=f"{prefix}/manifest.json")["Body"].read())
+    shards = manifest.get("shards", [])
+    if not shards:
+        raise ValueError(f"No shards under s3://{bucket}/{prefix}")
+    period = manifest.get("period", 60)
+
+    expected = shards[0]["start"]
+    sep = ""
     with open(tmp_json, "w") as f:
-        f.write(json.dumps(entry) + "\n")
+        f.write('{"start": "%s", "target": [' % iso_from_epoch(expected))
+        for shard in shards:
+            s3.download_file(bucket, shard["key"], tmp_shard)
+            series = open_series_file(tmp_shard)
+            if not len(series):
+                continue
+            gap = max(0, (series.start - expected) // period)
+            values = [0] * gap + series.values.tolist()
+            f.write(sep + json.dumps(values)[1:-1])
+            sep = ", "
+            expected = series.end
+        f.write("]}\n")
+
+    digest = _upload(tmp_json, json_key)
+    print(f"Uploaded DeepAR JSON ({len(shards)} shards) to s3://{bucket}/{json_key}")
+    return digest
 
-    s3.upload_file(tmp_json, bucket, json_key)
-    print(f"Uploaded DeepAR JSON to s3://{bucket}/{json_key}")
+
+def _init_worker():
+    # boto3 clients shouldn't cross a fork; give each worker its own
+    global s3
+    s3 = boto3.client("s3", region_name=region)
+
+
+def _convert(job):
+    kind, source, json_key = job
+    if kind == "csv":
+        return convert_csv_to_deepar_json(source, json_key)
+    return convert_series_to_deepar_json(source, json_key)
+
+
+def list_objects(prefix):
+    """Every object under prefix (follows list_objects_v2 pagination past 1000 keys)."""
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get("Contents", [])
+
+
+def load_dataset_manifest():
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=dataset_manifest_key)
+        return json.loads(obj["Body"].read())
+    except s3.exceptions.NoSuchKey:
+        return {"version": 1, "outputs": {}, "last_success": None}
+
+
+def save_dataset_manifest(manifest):
+    s3.put_object(Bucket=bucket, Key=dataset_manifest_key,
+                  Body=json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def dataset_hash(manifest):
+    """Hash of every output file + everything else that shapes the model."""
+    h = hashlib.sha256()
+    for json_key, entry in sorted(manifest["outputs"].items()):
+        h.update(f"{json_key}={entry['sha256']}\n".encode())
+    h.update(json.dumps({"image": training_image, "hyperparameters": hyperparameters},
+                        sort_keys=True).encode())
+    return h.hexdigest()
 
 
 def check_and_prepare_training_data():
+    """
+    Convert new/changed sources into deepar-json/ and return the dataset manifest.
+    A source whose ETag/size match the manifest (and whose output still
+    exists) is skipped; outputs whose source disappeared are deleted so they
+    don't keep feeding training.
+    """
+    manifest = load_dataset_manifest()
+    outputs = manifest.setdefault("outputs", {})
+    existing = {o["Key"] for o in list_objects(json_data_prefix)}
+
     # List objects in the training prefix
     train_csv_prefix = "training/"
-    resp = s3.list_objects_v2(Bucket=bucket, Prefix=train_csv_prefix)
-    has_json = False
-
-    for obj in resp.get("Contents", []):
+    sources = {}  # json_key -> (kind, source key/prefix, fingerprint)
+    for obj in list_objects(train_csv_prefix):
         key = obj["Key"]
         if key.endswith(".csv"):
             # Write JSON output to deepar-json/ instead of training/
             json_filename = os.path.basename(key).rsplit(".", 1)[0] + ".json"
-            json_key = f"{json_data_prefix}{json_filename}"
-            print(f"Converting {key} to {json_key} ...")
-            convert_csv_to_deepar_json(key, json_key)
-            has_json = True
+            sources[f"{json_data_prefix}{json_filename}"] = (
+                "csv", key, {"etag": obj["ETag"], "size": obj["Size"]})
+    for fn in train_series:
+        # the series manifest is rewritten on every append, so it fingerprints the series
+        prefix = series_prefix(fn)
+        head = s3.head_object(Bucket=bucket, Key=f"{prefix}/manifest.json")
+        sources[f"{json_data_prefix}series-{fn}.json"] = (
+            "series", prefix, {"etag": head["ETag"], "size": head["ContentLength"]})
 
-    if not has_json:
+    if not sources:
         raise Exception(
             f"No CSV file found in s3://{bucket}/{train_csv_prefix} to convert to DeepAR JSON.")
 
+    jobs = []
+    for json_key, (kind, source, fp) in sources.items():
+        entry = outputs.get(json_key) or {}
+        if (entry.get("source") == source and entry.get("etag") == fp["etag"]
+                and entry.get("size") == fp["size"] and json_key in existing):
+            continue
+        print(f"Converting {source} to {json_key} ...")
+        jobs.append((kind, source, json_key))
+    print(f"{len(sources) - len(jobs)} unchanged source(s) skipped, {len(jobs)} to convert")
+
+    workers = min(TRAIN_WORKERS, len(jobs))
+    if workers <= 1:
+        digests = [_convert(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            digests = list(pool.map(_convert, jobs))
+    for (_, source, json_key), digest in zip(jobs, digests):
+        outputs[json_key] = {"source": source, **sources[json_key][2], "sha256": digest}
+
+    for json_key in [k for k in outputs if k not in sources]:
+        print(f"Source for {json_key} is gone; removing it from the dataset")
+        s3.delete_object(Bucket=bucket, Key=json_key)
+        del outputs[json_key]
 
-# 0. Check for CSV in 'training/', convert to DeepAR JSON in 'deepar-json/'
-check_and_prepare_training_data()
-
-# 1. Start training (input points to deepar-json/)
-sagemaker.create_training_job(
-    TrainingJobName=training_job_name,
-    AlgorithmSpecification={
-        "TrainingImage": training_image,
-        "TrainingInputMode": "File"
-    },
-    RoleArn=role_arn,
-    InputDataConfig=[
-        {
-            "ChannelName": "train",
-            "DataSource": {
-                "S3DataSource": {
-                    "S3DataType": "S3Prefix",
-                    "S3Uri": train_data_uri,
-                    "S3DataDistributionType": "FullyReplicated"
-                }
-            },
-            "ContentType": "json"
+    save_dataset_manifest(manifest)
+    return manifest
+
+
+def main():
+    # 0. Check for CSV in 'training/', convert to DeepAR JSON in 'deepar-json/'
+    manifest = check_and_prepare_training_data()
+    data_hash = dataset_hash(manifest)
+    last = manifest.get("last_success") or {}
+    if last.get("dataset_hash") == data_hash and not force_retrain:
+        print(f"Dataset {data_hash[:12]} unchanged since training job {last['training_job']}; "
+              f"reusing its model artifact (FORCE_RETRAIN=1 to train anyway).")
+        print(f"Model artifact is at: {last['artifact']}")
+        print(f"Registered SageMaker model: {last['model_name']}")
+        return
+
+    # 1. Start training (input points to deepar-json/)
+    sagemaker.create_training_job(
+        TrainingJobName=training_job_name,
+        AlgorithmSpecification={
+            "TrainingImage": training_image,
+            "TrainingInputMode": "File"
+        },
+        RoleArn=role_arn,
+        InputDataConfig=[
+            {
+                "ChannelName": "train",
+                "DataSource": {
+                    "S3DataSource": {
+                        "S3DataType": "S3Prefix",
+                        "S3Uri": train_data_uri,
+                        "S3DataDistributionType": "FullyReplicated"
+                    }
+                },
+                "ContentType": "json"
+            }
+        ],
+        OutputDataConfig={
+            "S3OutputPath": output_uri
+        },
+        ResourceConfig={
+            "InstanceType": "ml.m5.xlarge",
+            "InstanceCount": 1,
+            "VolumeSizeInGB": 10
+        },
+        HyperParameters=hyperparameters,
+        StoppingCondition={
+            "MaxRuntimeInSeconds": 3600
         }
-    ],
-    OutputDataConfig={
-        "S3OutputPath": output_uri
-    },
-    ResourceConfig={
-        "InstanceType": "ml.m5.xlarge",
-        "InstanceCount": 1,
-        "VolumeSizeInGB": 10
-    },
-    HyperParameters={
-        "time_freq": "min",
-        "context_length": "120",
-        "prediction_length": "12",
-        "likelihood": "negative-binomial",
-        "num_cells": "50",
-        "epochs": "100"
-    },
-    StoppingCondition={
-        "MaxRuntimeInSeconds": 3600
-    }
-)
+    )
+
+    print(f"Started training job: {training_job_name}")
+
+    # 2. Wait for completion
+    print("Waiting for training to complete...")
+    while True:
+        status = sagemaker.describe_training_job(TrainingJobName=training_job_name)[
+            "TrainingJobStatus"]
+        print("Current status:", status)
+        if status in ["Completed", "Failed", "Stopped"]:
+            break
+        time.sleep(60)
+
+    if status != "Completed":
+        raise Exception(f"Training did not complete successfully: {status}")
+
+    # 3. Register new model with output artifact
+    artifact_path = sagemaker.describe_training_job(TrainingJobName=training_job_name)[
+        "ModelArtifacts"]["S3ModelArtifacts"]
+
+    print(f"Model artifact is at: {artifact_path}")
+
+    sagemaker.create_model(
+        ModelName=model_name,
+        PrimaryContainer={
+            "Image": training_image,
+            "ModelDataUrl": artifact_path
+        },
+        ExecutionRoleArn=role_arn
+    )
+
+    print(f"Registered new SageMaker model: {model_name}")
+    manifest["last_success"] = {"dataset_hash": data_hash, "training_job": training_job_name,
+                                "artifact": artifact_path, "model_name": model_name}
+    save_dataset_manifest(manifest)
+    print(f"Update your Terraform variable 'model_data_url' to: {artifact_path}")
+    print("Then run: terraform apply")
 
-print(f"Started training job: {training_job_name}")
-
-# 2. Wait for completion
-print("Waiting for training to complete...")
-while True:
-    status = sagemaker.describe_training_job(TrainingJobName=training_job_name)[
-        "TrainingJobStatus"]
-    print("Current status:", status)
-    if status in ["Completed", "Failed", "Stopped"]:
-        break
-    time.sleep(60)
-
-if status != "Completed":
-    raise Exception(f"Training did not complete successfully: {status}")
-
-# 3. Register new model with output artifact
-artifact_path = sagemaker.describe_training_job(TrainingJobName=training_job_name)[
-    "ModelArtifacts"]["S3ModelArtifacts"]
-
-print(f"Model artifact is at: {artifact_path}")
-
-sagemaker.create_model(
-    ModelName=model_name,
-    PrimaryContainer={
-        "Image": training_image,
-        "ModelDataUrl": artifact_path
-    },
-    ExecutionRoleArn=role_arn
-)
 
-print(f"Registered new SageMaker model: {model_name}")
-print(f"Update your Terraform variable 'model_data_url' to: {artifact_path}")
-print("Then run: terraform apply")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Offline replay of the pre-warm policy against a historical invocation series.
+
+    python src/scripts/simulate_prewarm.py history.csv --thresholds 100,200,300
+    python src/scripts/simulate_prewarm.py cloudwatch_metrics.json --forecaster ewma
+
+Input: collector JSON ([{"start", "target": [n]}]), a training CSV
+(minute,invocation_count) or a binary series file. Each minute the replay
+runs the init_manager rule (max(q90) >= threshold -> warm
+environments_needed(...) envs) with a pluggable forecaster, then serves that
+minute's real invocations from a pool of execution environments that expire
+after --idle-expiry minutes idle.
+
+Forecasts don't depend on the threshold, so they are computed once and the
+sweep only replays the (O(1)-per-minute) pool model per threshold.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+from forecasters import LOCAL_ENGINES  # noqa: E402
+from prewarm import environments_needed  # noqa: E402
+from series_prep import prepare, prepare_points  # noqa: E402
+from series_store import open_series_file  # noqa: E402
+
+
+# ---- input ------------------------------------------------------------------------
+def load_series(path):
+    """Any supported history file -> list of per-minute invocation counts."""
+    if path.endswith(".bin"):
+        return open_series_file(path).values.tolist()
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        series = prepare([r.get("minute") for r in rows],
+                         [r.get("invocation_count") for r in rows], agg="sum")
+    else:
+        with open(path) as f:
+            series = prepare_points(json.load(f), agg="last")
+    return series.values.tolist()
+
+
+# ---- forecasters: history -> peak p90 over the next `horizon` minutes ---------------
+def peaks_oracle(y, horizon, **_):
+    """Perfect foresight (upper bound on what any forecaster can achieve)."""
+    return [max(y[t + 1:t + 1 + horizon], default=0) for t in range(len(y))]
+
+
+def peaks_ewma_online(y, horizon, alpha=0.3, z90=1.2816, **_):
+    """Streaming EWMA with an EW residual variance; O(1) per minute."""
+    out, level, var = [], (y[0] if y else 0.0), 0.0
+    for v in y:
+        err = v - level
+        level += alpha * err
+        var = (1 - alpha) * (var + alpha * err * err)
+        out.append(max(0.0, level + z90 * math.sqrt(var * horizon)))
+    return out
+
+
+def peaks_engine(name, window, stride):
+    """Any forecasters.py engine, re-run every `stride` minutes on the last `window` points."""
+    engine = LOCAL_ENGINES[name]()
+
+    def run(y, horizon, **_):
+        out, peak = [], 0.0
+        for t in range(len(y)):
+            if t % stride == 0:
+                hist = y[max(0, t + 1 - window):t + 1]
+                peak = max(engine.predict([float(v) for v in hist], horizon, ["0.9"])["0.9"])
+            out.append(peak)
+        return out
+    return run
+
+
+# ---- pool model -------------------------------------------------------------------
+def simulate(y, peaks, threshold, duration_ms, cold_start_ms, idle_expiry, cap):
+    """
+    Replay one policy. The pool is a deque of [expiry_minute, envs, pinged_unused]
+    segments kept sorted by expiry (every refresh expires at t + idle_expiry, the
+    latest possible), so each minute only touches the ends of the deque.
+    """
+    pool = deque()
+    invocations = cold = prewarms = wasted = 0
+
+    def take(n):
+        """Use up to n live envs (earliest-expiring first); returns how many."""
+        got = pinged = 0
+        while pool and got < n:
+            seg = pool[0]
+            k = min(n - got, seg[1])
+            p = min(k, seg[2])
+            seg[1] -= k
+            seg[2] -= p
+            got += k
+            pinged += p
+            if seg[1] == 0:
+                pool.popleft()
+        return got, pinged
+
+    for t, n in enumerate(y):
+        # expire idle envs; pings nobody used since are wasted
+        while pool and pool[0][0] <= t:
+            wasted += pool.popleft()[2]
+
+        # decision (made with data up to t-1, like the real per-minute loop)
+        if threshold is not None and t > 0 and peaks[t - 1] >= threshold:
+            k = environments_needed(peaks[t - 1], duration_ms, cap)
+            _, pinged = take(k)
+            wasted += pinged  # re-pinging an env that was pinged and not used since
+            prewarms += k
+            pool.append([t + idle_expiry, k, k])
+
+        # serve this minute's traffic
+        need = int(math.ceil(n * duration_ms / 60000.0)) if n else 0
+        got, _ = take(need)
+        cold += need - got
+        invocations += int(n)
+        if need:
+            pool.append([t + idle_expiry, need, 0])
+
+    # still-unused pings at the end count as waste too
+    wasted += sum(seg[2] for seg in pool)
+
+    # added latency: each cold environment delays its first invocation
+    cold_share = cold / invocations if invocations else 0.0
+    return {
+        "threshold": threshold,
+        "invocations": invocations,
+        "cold_starts": cold,
+        "cold_start_rate": round(cold_share, 6),
+        "p50_added_ms": cold_start_ms if cold_share > 0.5 else 0.0,
+        "p99_added_ms": cold_start_ms if cold_share > 0.01 else 0.0,
+        "prewarm_invocations": prewarms,
+        "wasted_prewarms": wasted,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("input")
+    ap.add_argument("--thresholds", default="100,200,300,400,500")
+    ap.add_argument("--forecaster", default="ewma-online",
+                    choices=["oracle", "ewma-online"] + sorted(LOCAL_ENGINES))
+    ap.add_argument("--horizon", type=int, default=12, help="prediction_length (minutes)")
+    ap.add_argument("--window", type=int, default=240, help="history per forecast")
+    ap.add_argument("--stride", type=int, default=1, help="re-forecast every N minutes")
+    ap.add_argument("--duration-ms", type=float, default=1000.0)
+    ap.add_argument("--cold-start-ms", type=float, default=800.0)
+    ap.add_argument("--idle-expiry", type=int, default=10, help="minutes an idle env lives")
+    ap.add_argument("--cap", type=int, default=50, help="MAX_PREWARM")
+    ap.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = ap.parse_args()
+
+    y = load_series(args.input)
+    t0 = time.perf_counter()
+    if args.forecaster == "oracle":
+        peaks = peaks_oracle(y, args.horizon)
+    elif args.forecaster == "ewma-online":
+        peaks = peaks_ewma_online(y, args.horizon)
+    else:
+        peaks = peaks_engine(args.forecaster, args.window, args.stride)(y, args.horizon)
+    t1 = time.perf_counter()
+
+    thresholds = [None] + [float(x) for x in args.thresholds.split(",") if x.strip()]
+    rows = [simulate(y, peaks, th, args.duration_ms, args.cold_start_ms,
+                     args.idle_expiry, args.cap) for th in thresholds]
+    t2 = time.perf_counter()
+
+    if args.json:
+        print(json.dumps({"minutes": len(y), "forecaster": args.forecaster, "results": rows},
+                         indent=2))
+        return
+    print(f"{len(y)} minutes | forecaster={args.forecaster} "
+          f"(forecast {t1 - t0:.2f}s, sweep {t2 - t1:.2f}s)")
+    print(f"{'threshold':>10}{'cold rate':>11}{'cold':>9}{'p50 ms':>8}{'p99 ms':>8}"
+          f"{'prewarms':>10}{'wasted':>9}")
+    for r in rows:
+        th = "none" if r["threshold"] is None else f"{r['threshold']:g}"
+        print(f"{th:>10}{r['cold_start_rate']:>11.4f}{r['cold_starts']:>9}"
+              f"{r['p50_added_ms']:>8.0f}{r['p99_added_ms']:>8.0f}"
+              f"{r['prewarm_invocations']:>10}{r['wasted_prewarms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Import-time and first-call cost of each Lambda handler, measured in a fresh
+interpreter per handler (what a cold start pays before any work is done).
+
+    python tests/benchmarks/bench_cold_init.py [--runs 5]
+
+No AWS calls are made: "first call" is building the handler's boto3 clients
+through aws_clients.client(); "second call" is the cached lookup a warm
+invocation pays.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src", "lambda")
+
+# handler module -> the clients it asks for on a normal invocation
+HANDLERS = {
+    "target_function": [],
+    "logs_proxy": ["logs"],
+    "data_collector": ["cloudwatch", "s3"],
+    "init_manager": ["s3", "lambda", "sagemaker-runtime"],
+}
+
+_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+import aws_clients
+services = {services!r}
+for s in services:
+    aws_clients.client(s)
+t2 = time.perf_counter()
+for s in services:
+    aws_clients.client(s)
+t3 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1e3, "first_call_ms": (t2 - t1) * 1e3,
+                  "second_call_ms": (t3 - t2) * 1e3}}))
+"""
+
+
+def measure(module, services):
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+               ENDPOINT_NAME="bench", BUCKET_NAME="bench")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, services=services)],
+        cwd=LAMBDA_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"{'handler':<18}{'import ms':>12}{'1st clients ms':>16}{'cached ms':>12}")
+    for module, services in HANDLERS.items():
+        runs = [measure(module, services) for _ in range(args.runs)]
+        med = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        print(f"{module:<18}{med['import_ms']:>12.1f}{med['first_call_ms']:>16.1f}"
+              f"{med['second_call_ms']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
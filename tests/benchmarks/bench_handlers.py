@@ -0,0 +1,293 @@
+"""
+End-to-end handler benchmarks against local AWS stand-ins (fakes.py).
+
+    python tests/benchmarks/bench_handlers.py [--runs 30] [--only init_manager]
+                                              [--baseline FILE] [--tolerance 0.2]
+
+Every case runs a real lambda_handler in-process with varied series length,
+number of targets and payload size, and records the latency distribution
+(p50/p95/p99), peak traced memory and net allocated blocks. Results are
+written to tests/benchmarks/results/<utc-time>-<git-sha>.json and compared
+with the previous result file (or --baseline) so regressions show up
+between commits.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "src", "lambda"))
+sys.path.insert(0, HERE)
+RESULTS_DIR = os.path.join(HERE, "results")
+# forecast cache /tmp tier for this run only, so results don't depend on earlier runs
+CACHE_ROOT = tempfile.mkdtemp(prefix="bench-forecast-cache-")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.update({"BUCKET_NAME": "bench", "ENDPOINT_NAME": "bench-endpoint",
+                   "PREWARM_JITTER_MS": "0", "PREWARM_HOLD_MS": "0"})
+logging.disable(logging.INFO)  # the handlers log every run; keep that out of the timings
+
+import data_collector  # noqa: E402
+import forecast_cache  # noqa: E402
+import init_manager  # noqa: E402
+import logs_proxy  # noqa: E402
+import target_function  # noqa: E402
+from fakes import FakeAWS  # noqa: E402
+from series_store import SeriesStore, series_prefix  # noqa: E402
+
+
+class _Ctx:
+    function_name = "target_function"
+    client_context = None
+
+
+# ---- cases: name -> (setup() -> call) -------------------------------------------------
+def _collector(targets, backfill):
+    def setup():
+        aws = FakeAWS()
+        aws.install(data_collector)
+        data_collector.TARGET_FUNCTIONS = [f"fn{i}" for i in range(targets)]
+        data_collector.BUCKET_NAME = "bench"
+        if not backfill:
+            data_collector.lambda_handler({}, None)  # steady state: watermark exists
+
+        def call():
+            if backfill:
+                aws.s3.objects.clear()
+            data_collector.lambda_handler({}, None)
+        return call
+    return setup
+
+
+def _seed_series(aws, points, target="target_function"):
+    store = SeriesStore(aws.s3, "bench", series_prefix(target))
+    end = int(time.time()) // 60 * 60
+    store.append((end - (points - i) * 60, 100 + i % 50) for i in range(points))
+
+
+def _fresh_cache(name):
+    """Empty memory + /tmp forecast cache tiers for one case."""
+    forecast_cache._MEMORY.clear()
+    os.environ["FORECAST_CACHE_DIR"] = os.path.join(CACHE_ROOT, name.replace("/", "_"))
+
+
+def _init_manager(window, cached, forecaster="sagemaker", action="check", reuse=False):
+    """`reuse`: exact-input cache off, horizon reuse on (steady state = stored path kept)."""
+    def setup():
+        aws = FakeAWS()
+        aws.install(init_manager)
+        _seed_series(aws, window)
+        _fresh_cache(f"{window}-{cached}-{forecaster}-{action}-{reuse}")
+        os.environ.pop("FLEET_TARGETS", None)
+        os.environ.update({
+            "CONTEXT_LENGTH": str(window), "CONTEXT_MULTIPLIER": "1",
+            "FORECAST_CACHE_TTL": "600" if cached else "0",
+            "FORECAST_REUSE": "1" if reuse else "0",
+            "FORECASTER": forecaster, "THRESHOLD": "0" if action == "init" else "300",
+            "EXPECTED_DURATION_MS": "60000", "MAX_PREWARM": "20",
+            # init measures the fan-out itself; a plan or the warm pool would skip it
+            "PREWARM_PLAN": "0" if action == "init" else "1",
+            "WARM_POOL": "0" if action == "init" else "1"})
+        event = {"Input": {"action": action}}
+        init_manager.lambda_handler(event, None)  # warm the cache (if enabled)
+        return lambda: init_manager.lambda_handler(event, None)
+    return setup
+
+
+def _fleet(targets, window):
+    def setup():
+        aws = FakeAWS()
+        aws.install(init_manager)
+        names = [f"fn{i}" for i in range(targets)]
+        for name in names:
+            _seed_series(aws, window, name)
+        _fresh_cache(f"fleet-{targets}-{window}")
+        os.environ.update({
+            "FORECAST_REUSE": "0",
+            "FLEET_TARGETS": ",".join(names), "CONTEXT_LENGTH": str(window),
+            "CONTEXT_MULTIPLIER": "1", "FORECAST_CACHE_TTL": "0", "FORECASTER": "sagemaker",
+            "THRESHOLD": "300", "PREWARM_PLAN": "1"})
+        event = {"Input": {"action": "check"}}
+        return lambda: init_manager.lambda_handler(event, None)
+    return setup
+
+
+def _logs_proxy(events, message_bytes):
+    def setup():
+        aws = FakeAWS()
+        aws.install(logs_proxy)
+        logs_proxy.CACHE_TTL_S = 0  # measure the handler, not the response cache
+        now = int(time.time() * 1000)
+        msg = "[WARM-COLD] AM WARM (#1) " + "x" * max(0, message_bytes - 26)
+        aws.logs.events_by_group[logs_proxy.LOG_GROUPS["target"]] = [
+            {"timestamp": now - (events - i) * 100, "message": msg,
+             "logStreamName": "stream", "eventId": str(i)} for i in range(events)]
+        event = {"queryStringParameters": {"group": "target", "limit": str(events)}}
+        return lambda: logs_proxy.lambda_handler(event, None)
+    return setup
+
+
+def _logs_stats(invocations):
+    """view=stats over a realistic mix: status line + done line + EMF per invocation."""
+    def setup():
+        aws = FakeAWS()
+        aws.install(logs_proxy)
+        logs_proxy.CACHE_TTL_S = 0  # measure the handler, not the response cache
+        now = int(time.time() * 1000)
+        events = []
+        for i in range(invocations):
+            ts = now - (invocations - i) * 200
+            cold = i % 20 == 0
+            status = "AM COLD (#0)" if cold else f"AM WARM (#{i}) (JIT prewarmed)"
+            emf = json.dumps({"FunctionName": "target_function", "WarmStart": int(not cold),
+                              "ExecTimeMs": 5.0 + i % 7})
+            for msg in (f"INFO [WARM-COLD] {status}",
+                        f"INFO [WARM-COLD] done in {5.0 + i % 7:.2f} ms | warm=True", emf):
+                events.append({"timestamp": ts, "message": msg, "logStreamName": "s",
+                               "eventId": str(len(events))})
+        aws.logs.events_by_group[logs_proxy.LOG_GROUPS["target"]] = events
+        event = {"queryStringParameters": {"group": "target", "view": "stats",
+                                           "minutes": "60"}}
+        return lambda: logs_proxy.lambda_handler(event, None)
+    return setup
+
+
+def _target(ping, work_size):
+    def setup():
+        target_function.WORK_SIZE = work_size
+        event = {"prewarm": {"hold_ms": 0}} if ping else {}
+        ctx = _Ctx()
+        return lambda: target_function.lambda_handler(event, ctx)
+    return setup
+
+
+CASES = {
+    "data_collector/targets=1/steady": _collector(1, False),
+    "data_collector/targets=10/steady": _collector(10, False),
+    "data_collector/targets=50/steady": _collector(50, False),
+    "data_collector/targets=1/backfill": _collector(1, True),
+    "init_manager/window=240/miss": _init_manager(240, False),
+    "init_manager/window=1440/miss": _init_manager(1440, False),
+    "init_manager/window=10080/miss": _init_manager(10080, False),
+    "init_manager/window=240/hit": _init_manager(240, True),
+    "init_manager/window=240/ewma": _init_manager(240, False, "ewma"),
+    "init_manager/window=240/reuse": _init_manager(240, False, reuse=True),
+    "init_manager/window=240/init": _init_manager(240, True, action="init"),
+    "init_manager/fleet=100/window=240": _fleet(100, 240),
+    "logs_proxy/events=100/msg=100": _logs_proxy(100, 100),
+    "logs_proxy/events=1000/msg=100": _logs_proxy(1000, 100),
+    "logs_proxy/events=1000/msg=2000": _logs_proxy(1000, 2000),
+    "logs_proxy/stats/invocations=5000": _logs_stats(5000),
+    "target_function/work=40": _target(False, 40),
+    "target_function/ping": _target(True, 40),
+}
+
+
+# ---- measurement -------------------------------------------------------------------
+def _pct(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))]
+
+
+def run_case(setup, runs):
+    # handlers print EMF / log lines; send them to /dev/null, not the terminal
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        return _measure(setup, runs)
+
+
+def _measure(setup, runs):
+    call = setup()
+    call()  # warm-up
+    lat = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        call()
+        lat.append((time.perf_counter() - t0) * 1000.0)
+
+    # one traced run for memory (tracing slows everything, so it isn't timed)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, "filename"))
+
+    lat.sort()
+    return {"runs": runs, "p50_ms": _pct(lat, 0.5), "p95_ms": _pct(lat, 0.95),
+            "p99_ms": _pct(lat, 0.99), "mean_ms": statistics.fmean(lat),
+            "peak_kb": peak / 1024.0, "net_alloc_blocks": blocks}
+
+
+def _git_sha():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "nogit"
+
+
+def compare(current, baseline, tolerance):
+    """Cases whose p50 or peak memory grew by more than `tolerance` (fraction)."""
+    out = []
+    for name, cur in current.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        for metric in ("p50_ms", "peak_kb"):
+            if old[metric] > 0 and cur[metric] > old[metric] * (1 + tolerance):
+                out.append(f"{name}: {metric} {old[metric]:.2f} -> {cur[metric]:.2f}")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--runs", type=int, default=30)
+    ap.add_argument("--only", default="", help="substring filter on case names")
+    ap.add_argument("--baseline", help="result file to compare against (default: latest)")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    ap.add_argument("--no-save", action="store_true")
+    args = ap.parse_args()
+
+    results = {}
+    print(f"{'case':<36}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak KB':>10}{'blocks':>9}")
+    for name, setup in CASES.items():
+        if args.only and args.only not in name:
+            continue
+        r = results[name] = run_case(setup, args.runs)
+        print(f"{name:<36}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['peak_kb']:>10.1f}{r['net_alloc_blocks']:>9}")
+
+    baseline_path = args.baseline
+    if not baseline_path:
+        previous = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+        baseline_path = previous[-1] if previous else None
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f)["cases"], args.tolerance)
+        print(f"\nvs {os.path.basename(baseline_path)}: "
+              + ("no regressions" if not regressions else f"{len(regressions)} regression(s)"))
+        for line in regressions:
+            print("  " + line)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{_git_sha()}.json")
+        with open(path, "w") as f:
+            json.dump({"commit": _git_sha(), "python": sys.version.split()[0],
+                       "cases": results}, f, indent=2)
+        print(f"saved {os.path.relpath(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+In-process stand-ins for the AWS APIs the Lambdas call. They implement just
+the request/response shapes the handlers use, with no network or sleeps, so
+benchmarks measure the handlers' own work.
+"""
+import json
+import math
+from datetime import timedelta, timezone
+
+
+class _Body:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+class _Exceptions:
+    class NoSuchKey(Exception):
+        pass
+
+    class ResourceNotFoundException(Exception):
+        pass
+
+
+class FakeS3:
+    exceptions = _Exceptions
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def get_object(self, Bucket, Key, Range=None, **_):
+        self.calls.append(("get_object", Key))
+        if Key not in self.objects:
+            raise _Exceptions.NoSuchKey(Key)
+        data = self.objects[Key]
+        if Range:
+            first, _, last = Range.split("=", 1)[1].partition("-")
+            if first == "":
+                data = data[-int(last):]
+            else:
+                data = data[int(first):int(last) + 1 if last else None]
+        return {"Body": _Body(data), "ContentLength": len(data),
+                "ETag": '"%x"' % (hash(self.objects[Key]) & 0xffffffff)}
+
+    def put_object(self, Bucket, Key, Body, **_):
+        self.calls.append(("put_object", Key))
+        self.objects[Key] = Body.encode() if isinstance(Body, str) else bytes(Body)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", **_):
+        self.calls.append(("list_objects_v2", Prefix))
+        return {"Contents": [{"Key": k} for k in sorted(self.objects) if k.startswith(Prefix)],
+                "IsTruncated": False}
+
+    def delete_object(self, Bucket, Key, **_):
+        self.calls.append(("delete_object", Key))
+        self.objects.pop(Key, None)
+        return {}
+
+
+class FakeCloudWatch:
+    """get_metric_data over a synthetic 1-minute signal, paginated per `page_points`."""
+
+    def __init__(self, page_points=1440):
+        self.page_points = page_points
+        self.calls = 0
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, NextToken=None, **_):
+        self.calls += 1
+        start = StartTime.replace(second=0, microsecond=0, tzinfo=timezone.utc)
+        end = EndTime.replace(tzinfo=timezone.utc)
+        total = max(0, int((end - start).total_seconds() // 60))
+        first = int(NextToken or 0)
+        last = min(total, first + self.page_points)
+        results = []
+        for q in MetricDataQueries:
+            stamps = [start + timedelta(minutes=i) for i in range(first, last)]
+            results.append({
+                "Id": q["Id"],
+                "Timestamps": stamps,
+                "Values": [100.0 + 50.0 * math.sin(ts.timestamp() / 3600.0) for ts in stamps],
+            })
+        resp = {"MetricDataResults": results}
+        if last < total:
+            resp["NextToken"] = str(last)
+        return resp
+
+
+class FakeLogs:
+    """filter_log_events over a pre-generated list of events, paginated by `limit`."""
+
+    exceptions = _Exceptions
+
+    def __init__(self, events_by_group=None):
+        self.events_by_group = events_by_group or {}
+        self.calls = 0
+
+    def filter_log_events(self, logGroupName, startTime=0, limit=100, nextToken=None,
+                          filterPattern=None, **_):
+        self.calls += 1
+        if logGroupName not in self.events_by_group:
+            raise _Exceptions.ResourceNotFoundException(logGroupName)
+        events = [e for e in self.events_by_group[logGroupName] if e["timestamp"] >= startTime]
+        if filterPattern:
+            # plain terms, or `?"a" ?"b"` (match any); enough for the handlers' patterns
+            needles = [t.strip().strip('"') for t in filterPattern.split("?") if t.strip()]
+            events = [e for e in events if any(n in e["message"] for n in needles)]
+        first = int(nextToken or 0)
+        page = events[first:first + min(limit, 10000)]
+        resp = {"events": page}
+        if first + len(page) < len(events):
+            resp["nextToken"] = str(first + len(page))
+        return resp
+
+
+class FakeLambda:
+    """invoke() answers like target_function's pre-warm ping."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, FunctionName, InvocationType="RequestResponse", Payload=b"{}", **_):
+        self.calls += 1
+        if InvocationType == "Event":
+            return {"StatusCode": 202, "Payload": _Body(b"")}
+        body = {"status": "prewarmed", "prewarm": True, "env_id": f"env-{self.calls}"}
+        return {"StatusCode": 200, "Payload": _Body(json.dumps(body).encode())}
+
+
+class FakeSageMakerRuntime:
+    """invoke_endpoint returning DeepAR-shaped quantiles for every instance."""
+
+    def __init__(self, prediction_length=12):
+        self.prediction_length = prediction_length
+        self.calls = 0
+
+    def invoke_endpoint(self, EndpointName, Body, **_):
+        self.calls += 1
+        payload = json.loads(Body)
+        preds = []
+        for inst in payload["instances"]:
+            tail = inst["target"][-60:] or [0]
+            mean = sum(tail) / len(tail)
+            preds.append({"quantiles": {
+                q: [mean * (1.0 + float(q) - 0.5)] * self.prediction_length
+                for q in payload["configuration"]["quantiles"]}})
+        return {"Body": _Body(json.dumps({"predictions": preds}).encode())}
+
+
+class FakeGeneric:
+    """Any other client: every method call succeeds with an empty dict."""
+
+    def __getattr__(self, name):
+        return lambda *a, **k: {}
+
+
+class FakeAWS:
+    """One shared set of fakes + a drop-in for aws_clients.client()."""
+
+    def __init__(self):
+        self.s3 = FakeS3()
+        self.cloudwatch = FakeCloudWatch()
+        self.logs = FakeLogs()
+        self.lam = FakeLambda()
+        self.runtime = FakeSageMakerRuntime()
+        self._by_service = {"s3": self.s3, "cloudwatch": self.cloudwatch, "logs": self.logs,
+                            "lambda": self.lam, "sagemaker-runtime": self.runtime}
+
+    def client(self, service, **_):
+        return self._by_service.get(service) or FakeGeneric()
+
+    def install(self, *modules):
+        """Point each handler module's `client` at the fakes."""
+        for m in modules:
+            m.client = self.client
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The Lambdas and scripts aren't packages: import them the way they run
+# (flat modules), and reuse the in-process AWS fakes from the benchmarks.
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+for path in ("src/lambda", "src/scripts", "tests/benchmarks"):
+    sys.path.insert(0, os.path.join(ROOT, path))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
@@ -0,0 +1,76 @@
+import pytest
+
+from accuracy import (AccuracyState, forecast_record, load_state, pending_due, pending_key,
+                      pinball, score, state_key)
+from fakes import FakeS3
+
+
+def test_pinball():
+    assert pinball(10, 8, 0.9) == pytest.approx(1.8)   # under-forecast: tau x error
+    assert pinball(8, 10, 0.9) == pytest.approx(0.2)   # over-forecast: (1 - tau) x error
+    assert pinball(5, 5, 0.5) == 0
+
+
+def _record(issued, q50, q90, threshold=300, quantile="0.9", spike_level=300):
+    return forecast_record(issued, 60, {"0.5": q50, "0.9": q90}, "ewma",
+                           spike_level, threshold, quantile)
+
+
+def test_score_and_fold_track_per_horizon_loss_and_outcomes():
+    state = AccuracyState(alpha=0.5)
+    rec = _record(0, [100, 100], [400, 150])
+    state.fold(rec, score(rec, [100, 200]))
+    assert state.loss["0.5"] == [0.0, pytest.approx(50.0)]
+    assert state.loss["0.9"] == [pytest.approx(30.0), pytest.approx(45.0)]
+    # peak q90 400 >= 300 fired, actual peak 200 < 300: a false alarm
+    assert state.outcomes() == {"hits": 0, "misses": 0, "false_alarms": 1, "quiet": 0}
+
+
+def _history(rows):
+    """rows of (q50 peak, q90 peak, actual peak) -> state with those forecasts folded."""
+    state = AccuracyState()
+    for i, (p50, p90, actual) in enumerate(rows):
+        rec = _record(i * 60, [p50], [p90])
+        state.fold(rec, score(rec, [actual]))
+    return state
+
+
+def test_tune_finds_the_threshold_that_separates_spikes():
+    # q90 peaks of quiet periods reach 320, spikes are forecast at >= 380
+    rows = [(100, 320, 100)] * 10 + [(200, 380, 500)] * 5
+    tuned = _history(rows).tune(miss_cost=5, waste_cost=1, min_samples=10)
+    assert tuned["misses"] == 0 and tuned["false_alarms"] == 0
+    assert 320 < tuned["threshold"] <= 380
+
+
+def test_tune_weighs_misses_against_waste():
+    # one spike forecast low (q90 peak 250) among quiet periods forecast at 280
+    rows = [(100, 280, 100)] * 3 + [(100, 250, 500)] + [(200, 400, 500)] * 6
+    cheap_misses = _history(rows).tune(miss_cost=1, waste_cost=5, min_samples=10)
+    costly_misses = _history(rows).tune(miss_cost=50, waste_cost=1, min_samples=10)
+    assert cheap_misses["misses"] == 1 and cheap_misses["false_alarms"] == 0
+    assert costly_misses["misses"] == 0 and costly_misses["threshold"] <= 250
+
+
+def test_tune_needs_samples_and_a_real_spike():
+    assert _history([(100, 320, 100)] * 5).tune(min_samples=10) is None
+    assert _history([(100, 320, 100)] * 20).tune(min_samples=10) is None
+
+
+def test_pending_key_carries_the_horizon_end():
+    rec = _record(600, [1] * 12, [2] * 12)
+    key = pending_key("accuracy", "fn", rec)
+    assert key.startswith("accuracy/fn/pending/")
+    assert pending_due(key) == 600 + 12 * 60
+    assert pending_due("accuracy/fn/pending/junk") is None
+
+
+def test_load_state_applies_configured_alpha_and_window():
+    s3 = FakeS3()
+    stored = _history([(100, 320, 100)] * 10)
+    stored.alpha = 0.9
+    s3.put_object(Bucket="b", Key=state_key("accuracy", "fn"), Body=stored.to_json())
+    state = load_state(s3, "b", state_key("accuracy", "fn"), alpha=0.2, window=4)
+    assert state.alpha == 0.2
+    assert state.window == 4 and len(state.history) == 4
+    assert load_state(s3, "b", "missing").scored == 0
@@ -0,0 +1,24 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+import aws_clients
+
+
+def test_concurrent_first_calls_share_one_client(monkeypatch):
+    built = []
+
+    def slow_client(service, config=None):
+        time.sleep(0.05)  # wide window for a race
+        built.append(threading.get_ident())
+        return object()
+
+    monkeypatch.setattr(boto3, "client", slow_client)
+    monkeypatch.setattr(aws_clients, "_CLIENTS", {})
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: aws_clients.client("logs"), range(8)))
+    assert len(built) == 1
+    assert all(c is clients[0] for c in clients)
+    assert aws_clients.client("logs", read_timeout=5) is not clients[0]
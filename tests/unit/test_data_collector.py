@@ -0,0 +1,125 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import data_collector
+from fakes import FakeAWS, FakeCloudWatch
+from series_store import SeriesStore, iso_from_epoch, series_prefix
+
+START = 1_735_689_600  # 2025-01-01T00:00Z
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    fakes = FakeAWS()
+    fakes.install(data_collector)
+    monkeypatch.setattr(data_collector, "BUCKET_NAME", "bucket")
+    monkeypatch.setattr(data_collector, "TARGET_FUNCTIONS", ["fn"])
+    monkeypatch.setattr(data_collector, "ACCURACY", False)
+    return fakes
+
+
+def _store(aws, fn="fn", metric="Invocations"):
+    return SeriesStore(aws.s3, "bucket", series_prefix(fn, metric, data_collector.SERIES_ROOT))
+
+
+def _put_test_data(aws, minutes):
+    points = [{"start": iso_from_epoch(START + i * 60), "target": [i % 7]}
+              for i in range(minutes)]
+    aws.s3.put_object(Bucket="bucket", Key=data_collector.TEST_KEY, Body=json.dumps(points))
+
+
+def test_unchanged_test_data_is_not_resharded(aws):
+    _put_test_data(aws, 7 * 24 * 60)
+    assert data_collector.lambda_handler({}, None)["status"] == "updated (test)"
+    assert len(_store(aws).manifest()["shards"]) == 7 * 24
+
+    aws.s3.calls.clear()
+    assert data_collector.lambda_handler({}, None)["status"] == "unchanged (test)"
+    ops = [op for op, _ in aws.s3.calls]
+    assert ops.count("get_object") == 2  # test object + manifest
+    assert "put_object" not in ops
+
+
+def test_changed_test_data_is_appended(aws):
+    _put_test_data(aws, 60)
+    data_collector.lambda_handler({}, None)
+    _put_test_data(aws, 90)
+    assert data_collector.lambda_handler({}, None)["data_points"] == 90
+    assert _store(aws).manifest()["total"] == 90
+    assert data_collector.lambda_handler({}, None)["status"] == "unchanged (test)"
+
+
+# ---- fetch window (watermark / last empty check) ----------------------------------
+END = datetime(2025, 1, 2, 12, 0)
+
+
+def test_fetch_start_backs_off_the_watermark_by_the_late_margin(monkeypatch):
+    monkeypatch.setattr(data_collector, "LATE_MARGIN_MINUTES", 5)
+    monkeypatch.setattr(data_collector, "LOOKBACK_HOURS", 24)
+    assert data_collector._fetch_start("2025-01-02T11:30:00", END) == datetime(2025, 1, 2, 11, 25)
+    # never further back than the lookback, and unreadable/missing marks backfill
+    assert data_collector._fetch_start("2024-12-01T00:00:00", END) == END - timedelta(hours=24)
+    assert data_collector._fetch_start(None, END) == END - timedelta(hours=24)
+    assert data_collector._fetch_start("garbage", END) == END - timedelta(hours=24)
+
+
+def test_get_metric_data_follows_next_token():
+    cw = FakeCloudWatch(page_points=7)
+    queries = [{"Id": "m0"}, {"Id": "m1"}]
+    out = data_collector._get_metric_data(cw, queries, END - timedelta(minutes=30), END)
+    assert cw.calls == 5
+    for qid in ("m0", "m1"):
+        stamps = out[qid]["Timestamps"]
+        assert len(stamps) == len(out[qid]["Values"]) == 30
+        assert stamps == sorted(set(stamps))
+
+
+def test_handler_backfills_then_fetches_incrementally(aws, monkeypatch):
+    monkeypatch.setattr(data_collector, "METRICS", ["Invocations"])
+    monkeypatch.setattr(data_collector, "FUNCTION_METRICS", {})
+    aws.cloudwatch.page_points = 100
+    windows = []
+    fetch = aws.cloudwatch.get_metric_data
+
+    def spy(**kw):
+        if not kw.get("NextToken"):
+            windows.append((kw["EndTime"] - kw["StartTime"]).total_seconds() / 60)
+        return fetch(**kw)
+    aws.cloudwatch.get_metric_data = spy
+
+    first = data_collector.lambda_handler({}, None)
+    assert first["data_points"] >= 24 * 60 - 1  # paged backfill
+    assert _store(aws).fetched_through() == _store(aws).manifest()["watermark"]
+    data_collector.lambda_handler({}, None)
+    assert windows[0] >= 24 * 60
+    assert windows[1] <= data_collector.LATE_MARGIN_MINUTES + 2
+
+
+def test_empty_series_move_forward_without_widening_the_others(aws, monkeypatch):
+    monkeypatch.setattr(data_collector, "TARGET_FUNCTIONS", ["busy", "idle"])
+    monkeypatch.setattr(data_collector, "METRICS", ["Invocations"])
+    monkeypatch.setattr(data_collector, "FUNCTION_METRICS", {})
+    starts = []
+    fetch = aws.cloudwatch.get_metric_data
+
+    def idle_is_empty(**kw):
+        starts.append((kw["StartTime"], [q["Id"] for q in kw["MetricDataQueries"]]))
+        resp = fetch(**kw)
+        for r in resp["MetricDataResults"]:
+            if r["Id"] == "m1":
+                r["Timestamps"], r["Values"] = [], []
+        return resp
+    aws.cloudwatch.get_metric_data = idle_is_empty
+
+    data_collector.lambda_handler({}, None)
+    idle = _store(aws, "idle")
+    assert idle.manifest()["watermark"] is None
+    assert idle.fetched_through() == idle.manifest()["checked"]
+
+    starts.clear()
+    data_collector.lambda_handler({}, None)
+    # both series now have a mark: one incremental call, no 24h backfill for "idle"
+    assert [ids for _, ids in starts] == [["m0", "m1"]]
+    assert datetime.utcnow() - starts[0][0] < timedelta(minutes=10)
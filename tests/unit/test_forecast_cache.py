@@ -0,0 +1,46 @@
+from forecast_cache import horizon_entry, reuse_horizon
+
+ISSUED, PERIOD = 600_000, 60
+# band per step: [q50 - (q90 - q50), q90] = [60, 140]
+PRED = {"0.5": [100] * 12, "0.9": [140] * 12}
+
+
+def _entry(version="v1"):
+    return horizon_entry(ISSUED, PERIOD, PRED, "sagemaker", version)
+
+
+def test_path_is_reused_from_the_first_unobserved_step():
+    pred, reason = reuse_horizon(_entry(), ISSUED + 3 * PERIOD, [0, 0, 60, 100, 140], "v1")
+    assert reason == "reused (3/12 steps)"
+    assert pred == {"0.5": [100] * 9, "0.9": [140] * 9}
+    # nothing observed yet: the whole path stands
+    pred, _ = reuse_horizon(_entry(), ISSUED, [], "v1")
+    assert pred == PRED
+
+
+def test_drift_reports_the_first_step_outside_the_band():
+    # the last `step` actuals line up with steps 0..2 of the path
+    pred, reason = reuse_horizon(_entry(), ISSUED + 3 * PERIOD, [100, 141, 100], "v1")
+    assert pred is None and reason.startswith("drift at step 1 ")
+    pred, reason = reuse_horizon(_entry(), ISSUED + 3 * PERIOD, [100, 100, 59], "v1")
+    assert pred is None and reason.startswith("drift at step 2 ")
+
+
+def test_used_up_horizon_is_dropped():
+    actuals = [100] * 12
+    pred, _ = reuse_horizon(_entry(), ISSUED + 9 * PERIOD, actuals, "v1", min_remaining=3)
+    assert pred is not None
+    pred, reason = reuse_horizon(_entry(), ISSUED + 10 * PERIOD, actuals, "v1", min_remaining=3)
+    assert pred is None and reason == "horizon used (10/12 steps)"
+
+
+def test_model_version_change_drops_the_path():
+    assert reuse_horizon(_entry("v1"), ISSUED, [], "v2") == (None, "model version changed")
+
+
+def test_missing_actuals_or_entry_forecast_again():
+    assert reuse_horizon(_entry(), ISSUED + 3 * PERIOD, [100, 100], "v1") == (
+        None, "missing actuals")
+    assert reuse_horizon(None, ISSUED, [], "v1") == (None, "none stored")
+    assert reuse_horizon(_entry(), ISSUED - PERIOD, [], "v1") == (
+        None, "series went backwards")
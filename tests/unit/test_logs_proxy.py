@@ -0,0 +1,49 @@
+from fakes import FakeLogs
+
+import logs_proxy
+
+GROUPS = [("target", "/aws/lambda/target"), ("init", "/aws/lambda/init")]
+
+
+def _logs():
+    events = {group: [] for _, group in GROUPS}
+    # interleaved timestamps, with ties inside and across groups
+    for i in range(12):
+        for n, (_, group) in enumerate(GROUPS):
+            ts = 1_000_000 + (i // 2) * 1000 + n
+            events[group].append({"timestamp": ts, "message": f"{group} {i}",
+                                  "logStreamName": "s", "eventId": f"{group}-{i}"})
+    return FakeLogs(events)
+
+
+def test_multi_merges_by_time_and_resumes_without_duplicates():
+    logs = _logs()
+    kwargs = {"startTime": 0, "limit": 5}
+    seen, token, pages = [], None, 0
+    while True:
+        page = logs_proxy._multi(logs, GROUPS, dict(kwargs), 5, token)
+        seen.extend(page["items"])
+        pages += 1
+        token = page["next"]
+        if not token:
+            break
+    assert pages == 5
+    ids = [it["id"] for it in seen]
+    assert len(ids) == len(set(ids)) == 24
+    assert [it["ts"] for it in seen] == sorted(it["ts"] for it in seen)
+
+
+def test_multi_cursor_tails_only_new_events():
+    logs = _logs()
+    page = logs_proxy._multi(logs, GROUPS, {"startTime": 0, "limit": 100}, 100, None)
+    assert page["count"] == 24 and page["next"] is None
+
+    logs.events_by_group["/aws/lambda/init"].append(
+        {"timestamp": 2_000_000, "message": "late", "logStreamName": "s", "eventId": "late"})
+    tail = logs_proxy._multi(logs, GROUPS, {"startTime": 0, "limit": 100}, 100, page["cursor"])
+    assert [it["id"] for it in tail["items"]] == ["late"]
+    assert tail["items"][0]["group"] == "init"
+
+
+def test_bad_cursor_starts_over():
+    assert logs_proxy._decode_cursor("not base64 json") == {}
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+
+from fakes import _Body
+from prewarm import environments_needed, fan_out, plan_prewarms
+
+START, PERIOD = 1_000_020, 60
+# 60 invocations/min x 60 s each -> 60 concurrent environments (capped below)
+SIZING = dict(duration_ms=1000.0, cap=50)
+
+
+def _plan(peaks, threshold=100, **kw):
+    return plan_prewarms(START, PERIOD, peaks, threshold, **{**SIZING, **kw})
+
+
+def test_environments_needed_is_bounded():
+    assert environments_needed(0, 1000, cap=10) == 1
+    assert environments_needed(600, 1000, cap=50) == 10
+    assert environments_needed(60_000, 1000, cap=50) == 50
+
+
+def test_nothing_planned_below_threshold():
+    assert _plan([10, 50, 99]) == []
+
+
+def test_entry_fires_one_cold_start_ahead_of_its_step():
+    plan = _plan([10, 600, 10], lead_s=2.0)
+    assert plan == [{"at": START + PERIOD - 2.0, "envs": 10, "step": 1}]
+
+
+def test_steps_covered_by_already_warm_envs_are_skipped():
+    # same need three minutes in a row: one entry keeps all of them warm
+    plan = _plan([600, 600, 600], idle_expiry_s=600)
+    assert [e["step"] for e in plan] == [0]
+
+
+def test_bigger_need_or_expiry_adds_an_entry():
+    plan = _plan([600, 1200, 600], idle_expiry_s=600)
+    assert [(e["step"], e["envs"]) for e in plan] == [(0, 10), (1, 20)]
+    # with a 90 s idle expiry the step two minutes later needs a fresh warm
+    plan = _plan([600, 10, 600], idle_expiry_s=90)
+    assert [e["step"] for e in plan] == [0, 2]
+
+
+def test_previous_warm_state_is_respected():
+    plan = _plan([600, 600], warm_count=10, warm_until=START + 10 * PERIOD)
+    assert plan == []
+    plan = _plan([600, 600], warm_count=5, warm_until=START + 10 * PERIOD)
+    assert [(e["step"], e["envs"]) for e in plan] == [(0, 10)]
+
+
+def test_trigger_path_decides_and_peaks_size():
+    plan = _plan([600, 600], trigger=[50, 150])
+    assert [(e["step"], e["envs"]) for e in plan] == [(1, 10)]
+
+
+class _Lambda:
+    """invoke() answering from a script of (env_id | None | "error" | "raise") per call."""
+
+    def __init__(self, script, hold_s=0.0):
+        self.script = list(script)
+        self.hold_s = hold_s
+        self.lock = threading.Lock()
+        self.in_flight = self.peak = 0
+
+    def invoke(self, **_):
+        with self.lock:
+            what = self.script.pop(0)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.hold_s)
+        with self.lock:
+            self.in_flight -= 1
+        if what == "raise":
+            raise RuntimeError("throttled")
+        if what == "error":
+            return {"StatusCode": 200, "FunctionError": "Unhandled",
+                    "Payload": _Body(b'{"errorMessage": "boom"}')}
+        body = {"status": "prewarmed"} if what is None else {"env_id": what}
+        return {"StatusCode": 200, "Payload": _Body(json.dumps(body).encode())}
+
+
+def test_fan_out_counts_distinct_environments():
+    # pings that land on an env another ping already woke are not new envs
+    lam = _Lambda(["a", "b", "a", "c", "b", None, None])
+    out = fan_out(lam, "target", 7, "ctx")
+    assert out["requested"] == 7
+    assert out["env_ids"] == ["a", "b", "c"]
+    assert out["confirmed"] == 3 + 2  # responses without an env_id count as one each
+    assert out["failed"] == 0
+
+
+def test_fan_out_reports_function_errors_and_exceptions_as_failures():
+    lam = _Lambda(["a", "error", "raise", "b"])
+    out = fan_out(lam, "target", 4, "ctx")
+    assert (out["confirmed"], out["failed"]) == (2, 2)
+    assert sorted(out["errors"]) == ["function error: Unhandled", "throttled"]
+
+
+def test_fan_out_keeps_every_ping_in_flight_unless_capped():
+    lam = _Lambda([f"e{i}" for i in range(12)], hold_s=0.05)
+    assert fan_out(lam, "target", 12, "ctx")["confirmed"] == 12
+    assert lam.peak == 12
+    lam = _Lambda([f"e{i}" for i in range(12)], hold_s=0.05)
+    fan_out(lam, "target", 12, "ctx", max_workers=4)
+    assert lam.peak == 4
+    assert fan_out(lam, "target", 0, "ctx")["requested"] == 0
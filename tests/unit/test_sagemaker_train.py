@@ -0,0 +1,54 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from series_prep import prepare
+
+from sagemaker_train import _epochs, _JsonLineWriter, _OutOfOrder
+
+ROWS = [
+    ("2025-01-01 00:00:10", 1), ("2025-01-01 00:00:50", 2),   # same minute: summed
+    ("2025-01-01 00:01:00", 3),
+    ("2025-01-01 00:01:30", 4),                              # continues across a chunk
+    ("2025-01-01 00:04:00", 5),                              # gap -> zeros
+    ("2025-01-01 00:05:00", 6), ("2025-01-01 00:05:59", 7),
+]
+
+
+def _stream(chunks):
+    f = io.StringIO()
+    writer = _JsonLineWriter(f)
+    for chunk in chunks:
+        writer.add(prepare([t for t, _ in chunk], [v for _, v in chunk], agg="sum",
+                           typecode="f"))
+    assert writer.close()
+    return json.loads(f.getvalue())
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, len(ROWS)])
+def test_streamed_line_matches_whole_file_prepare(size):
+    whole = prepare([t for t, _ in ROWS], [v for _, v in ROWS], agg="sum")
+    line = _stream([ROWS[i:i + size] for i in range(0, len(ROWS), size)])
+    assert line == {"start": whole.start_iso, "target": whole.values.tolist()}
+    assert line["target"] == [3, 7, 0, 0, 5, 13]
+
+
+def test_rows_going_back_across_chunks_are_detected():
+    with pytest.raises(_OutOfOrder):
+        _stream([ROWS[4:], ROWS[:4]])
+
+
+def test_empty_input_writes_nothing():
+    f = io.StringIO()
+    assert _JsonLineWriter(f).close() is False
+    assert f.getvalue() == ""
+
+
+def test_csv_timestamps_parse_like_pandas():
+    # non-ISO formats pandas accepts, and blank cells that read back as NaN
+    column = pd.Series(["2025/01/01 00:00", "2025/01/01 00:02", float("nan")])
+    series = prepare(_epochs(column), [1, 2, 3], agg="sum")
+    assert series.start_iso == "2025-01-01 00:00:00"
+    assert list(series.values) == [1, 0, 2]
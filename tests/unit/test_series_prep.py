@@ -0,0 +1,20 @@
+import pytest
+
+from series_prep import prepare, to_epoch
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), None, "", "junk"])
+def test_unparseable_timestamps_are_none(value):
+    assert to_epoch(value) is None
+
+
+def test_to_epoch_accepts_iso_datetimes_and_numbers():
+    assert to_epoch("2025-01-01T00:01:00Z") == 1_735_689_660
+    assert to_epoch("2025-01-01 00:01:00") == 1_735_689_660  # naive = UTC
+    assert to_epoch(1_735_689_660.7) == 1_735_689_660
+
+
+def test_blank_time_cells_are_skipped():
+    series = prepare(["2025-01-01 00:00:00", float("nan"), "2025-01-01 00:01:00"], [1, 2, 3])
+    assert series.start == 1_735_689_600
+    assert list(series.values) == [1, 3]
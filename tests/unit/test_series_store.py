@@ -0,0 +1,54 @@
+from array import array
+
+import pytest
+
+from fakes import FakeS3
+from series_store import Series, SeriesStore, decode_series, encode_series
+
+HOUR = 3600
+
+
+@pytest.mark.parametrize("typecode,values", [
+    ("i", [0, 1, -5, 2 ** 31 - 1, 42]),
+    ("f", [0.0, 1.5, -2.25, 1e6]),
+])
+def test_encode_decode_round_trip(typecode, values):
+    series = Series(1_700_000_040, 60, array(typecode, values))
+    out = decode_series(encode_series(series, typecode))
+    assert (out.start, out.period) == (series.start, series.period)
+    assert list(out.values) == list(series.values)
+
+
+def test_decode_rejects_foreign_buffers():
+    with pytest.raises(ValueError):
+        decode_series(b"NOPE" + bytes(40))
+
+
+def _store():
+    return SeriesStore(FakeS3(), "bucket", "series/fn/Invocations")
+
+
+def test_tail_across_shard_boundaries():
+    store = _store()
+    start = 1_700_000_000 // HOUR * HOUR - 30 * 60  # 30 min before an hour boundary
+    store.append((start + i * 60, i) for i in range(150))  # spans three hourly shards
+    assert len(store.manifest()["shards"]) == 3
+
+    reader = SeriesStore(store.s3, "bucket", "series/fn/Invocations")
+    tail = reader.tail(100)
+    assert tail.start == start + 50 * 60
+    assert list(tail.values) == list(range(50, 150))
+    # asking for more than exists returns everything
+    assert list(reader.tail(1000).values) == list(range(150))
+
+
+def test_tail_reads_gaps_as_zero_and_later_appends_overwrite():
+    store = _store()
+    start = 1_700_000_000 // HOUR * HOUR
+    store.append([(start, 1), (start + 180, 4)])
+    store.append([(start + 180, 9), (start + HOUR, 7)])
+    tail = SeriesStore(store.s3, "bucket", "series/fn/Invocations").tail(61)
+    assert tail.start == start
+    assert list(tail.values[:4]) == [1, 0, 0, 9]  # gaps read as 0, second append wins
+    assert tail.values[-1] == 7
+    assert sum(tail.values) == 17
@@ -0,0 +1,98 @@
+import json
+import time
+
+import pytest
+
+import init_manager
+from fakes import FakeAWS, FakeLogs, FakeS3
+from warm_pool import WarmPool, env_activity, load_pool, refresh_from_logs, save_pool
+
+GROUP = "/aws/lambda/target"
+NOW = 1_000_000.0
+
+
+def _emf(env_id, ts, **fields):
+    body = {"_aws": {"Timestamp": int(ts * 1000)}, "EnvId": env_id, **fields}
+    return {"timestamp": int(ts * 1000), "message": json.dumps(body), "eventId": f"{env_id}@{ts}"}
+
+
+def test_env_activity_reads_only_emf_lines_with_an_env_id():
+    events = [
+        _emf("a", NOW),
+        {"timestamp": 1000, "message": "START RequestId: x"},
+        {"timestamp": 2000, "message": '2025 INFO {"EnvId": "b"}'},   # JSON after a prefix
+        {"timestamp": 3000, "message": '{"EnvId": broken'},
+        {"timestamp": 4000, "message": json.dumps({"EnvId": ""})},
+    ]
+    assert list(env_activity(events)) == [("a", NOW), ("b", 2.0)]
+
+
+def test_expire_and_live_use_the_idle_window():
+    pool = WarmPool({"old": NOW - 600, "edge": NOW - 599, "new": NOW})
+    assert pool.live(NOW, 600) == 2
+    assert pool.expire(NOW, 600) == 1
+    assert sorted(pool.last_seen) == ["edge", "new"]
+    pool.observe("new", NOW - 50)  # older sightings never move an env back
+    assert pool.last_seen["new"] == NOW
+
+
+def test_refresh_reads_from_the_cursor_and_pages():
+    logs = FakeLogs({GROUP: [_emf(f"e{i}", NOW - 300 + i) for i in range(25)]
+                     + [_emf("stale", NOW - 900)]})
+    fetch = logs.filter_log_events
+    logs.filter_log_events = lambda **kw: fetch(**{**kw, "limit": 10})  # force 3 pages
+    pool = WarmPool()
+
+    assert refresh_from_logs(pool, logs, GROUP, idle_s=600, now=NOW) == 25
+    assert logs.calls == 3
+    assert pool.live(NOW, 600) == 25 and "stale" not in pool.last_seen
+    assert pool.cursor_ms == int((NOW - 276) * 1000)
+
+    # next cycle starts at the cursor: only the new line (plus the cursor's own ms) is read
+    logs.events_by_group[GROUP].append(_emf("late", NOW + 10))
+    assert refresh_from_logs(pool, logs, GROUP, idle_s=600, now=NOW + 20) == 2
+    assert "late" in pool.last_seen
+
+
+def test_pool_round_trips_through_s3():
+    s3 = FakeS3()
+    save_pool(s3, "b", "warm-pools/t.json", WarmPool({"a": NOW}, cursor_ms=42))
+    pool = load_pool(s3, "b", "warm-pools/t.json")
+    assert (pool.last_seen, pool.cursor_ms) == ({"a": NOW}, 42)
+    assert load_pool(s3, "b", "missing").last_seen == {}
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    fakes = FakeAWS()
+    fakes.install(init_manager)
+    for name, value in {"WARM_POOL": "1", "IDLE_EXPIRY_S": "600", "MAX_PREWARM": "50",
+                        "PREWARM_HOLD_MS": "0", "PREWARM_JITTER_MS": "0"}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("LOG_GROUP_PREFIX", raising=False)
+    return fakes
+
+
+def test_prewarm_pings_only_the_shortfall(aws):
+    now = time.time()
+    aws.logs.events_by_group[GROUP] = [_emf(f"live{i}", now - 60) for i in range(3)]
+    out = init_manager._prewarm(aws.s3, aws.lam, "b", "target", peak=0, parallel=4, wanted=5)
+    assert (out["wanted"], out["live"], out["requested"]) == (5, 3, 2)
+    assert out["confirmed"] == out["environments"] == 2
+    assert out["live_after"] == 5
+    assert len(load_pool(aws.s3, "b", init_manager._pool_key("target")).last_seen) == 5
+
+
+def test_prewarm_with_a_full_pool_sends_nothing(aws):
+    now = time.time()
+    aws.logs.events_by_group[GROUP] = [_emf(f"live{i}", now - 60) for i in range(8)]
+    out = init_manager._prewarm(aws.s3, aws.lam, "b", "target", peak=0, parallel=4, wanted=5)
+    assert (out["live"], out["requested"], out["live_after"]) == (8, 0, 8)
+    assert aws.lam.calls == 0
+
+
+def test_prewarm_without_tracking_counts_confirmed_pings(aws, monkeypatch):
+    monkeypatch.setenv("WARM_POOL", "0")
+    out = init_manager._prewarm(aws.s3, aws.lam, "b", "target", peak=0, parallel=4, wanted=80)
+    assert out["wanted"] == 50  # clamped to MAX_PREWARM
+    assert (out["live"], out["requested"], out["live_after"]) == (0, 50, 50)